@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 inett GmbH
+# License: GNU General Public License v2
+# A file is subject to the terms and conditions defined in the file LICENSE,
+# which is part of this source code package.
+"""End-to-end benchmark of the agent plugin against a fake PBS
+
+Runs agents/plugins/proxmox_bs with the fake PBS commands from benchmark/bin
+first in PATH, for every combination of datastore and namespace count, and
+reports its wall time, the processes it started (PBS commands, curl and jq),
+the API requests it sent and the size of its output. With --collector api,
+the agent plugin reads the PBS REST API of benchmark/fake_api.py instead.
+Needs bash and jq, and curl for the api collector.
+
+    benchmark/agent_harness.py --data-stores 1 4 --namespaces 0 4 --latency 0.05
+    benchmark/agent_harness.py --env PBS_SNAPSHOT_MODE=delta --parse
+    benchmark/agent_harness.py --collector api --env PBS_TASK_MODE=window --parse
+
+With --parse, the output is also parsed by the check plugin, which needs the
+Checkmk Python modules, and checked for the datastores and clients of the
+fake PBS.
+"""
+import argparse
+import collections
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK = os.path.dirname(os.path.abspath(__file__))
+AGENT = os.path.join(os.path.dirname(BENCHMARK), "agents", "plugins", "proxmox_bs")
+PLUGIN = os.path.join(
+    os.path.dirname(BENCHMARK), "cmk_addons_plugins", "proxmox_bs", "agent_based", "proxmox_bs.py",
+)
+
+sys.path.insert(0, BENCHMARK)
+from agent_output import FakePBS, persisted, string_tables  # noqa: E402
+from fake_api import start_server  # noqa: E402
+
+
+def run_agent(env, runs, api=None):
+    """output of the last of runs agent runs, their best wall time, the
+    processes started and API requests sent by the last run, and the sections
+    Checkmk keeps from all runs (persist). With api, a FakePBS, the agent
+    plugin reads it from a fake REST API."""
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "proxmox_bs.env"), "w") as f:
+            f.write("export PBS_USERNAME='monitoring@pbs'\n"
+                    "export PBS_PASSWORD='secret'\n"
+                    "export PBS_DNS_NAME='localhost'\n"
+                    "export PBS_FINGERPRINT='00:00'\n")
+        env = dict(
+            os.environ,
+            PATH=os.path.join(BENCHMARK, "bin") + ":" + os.environ["PATH"],
+            MK_CONFDIR=tmp,
+            MK_VARDIR=os.path.join(tmp, "var"),
+            PBS_FAKE_CALLS=os.path.join(tmp, "calls"),
+            **env,
+        )
+        server = None
+        if api is not None:
+            server = start_server(api, float(env.get("PBS_FAKE_LATENCY", 0)), env["PBS_FAKE_CALLS"])
+            env.update(PBS_COLLECTOR="api", PBS_API_URL=f"http://127.0.0.1:{server.server_port}")
+        best, kept = None, {}
+        for _ in range(runs):
+            if os.path.exists(env["PBS_FAKE_CALLS"]):
+                os.remove(env["PBS_FAKE_CALLS"])
+            start = time.perf_counter()
+            agent = subprocess.run(["bash", AGENT], env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   check=True, text=True)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            persisted(agent.stdout, kept)
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        with open(env["PBS_FAKE_CALLS"]) as f:
+            calls = collections.Counter(" ".join(line.split()[:2]) for line in f)
+    return agent.stdout, best, calls, kept
+
+
+def check_output(plugin, output, pbs, piggyback=False):
+    """problems the check plugin sees in the agent output of pbs, with the clients sent as piggyback data"""
+    tables = string_tables(output)
+    sections = {
+        "section_proxmox_bs": plugin.parse_proxmox_bs_base(tables.get("proxmox_bs", [])),
+        "section_proxmox_bs_tasks": plugin.parse_proxmox_bs_tasks(tables.get("proxmox_bs_tasks", [])),
+        "section_proxmox_bs_gc": plugin.parse_proxmox_bs(tables.get("proxmox_bs_gc", [])),
+        "section_proxmox_bs_snapshots": plugin.parse_proxmox_bs_snapshots(tables.get("proxmox_bs_snapshots", [])),
+    }
+    problems = [
+        f"{name} {suffix}: {error}"
+        for section in sections.values() for name, suffix, error in section['errors']
+    ]
+    stores = sorted(service.item for service in plugin.discover_proxmox_bs(**sections))
+    if stores != pbs.stores:
+        problems.append(f"datastores {stores}, expected {pbs.stores}")
+    clients = len(list(plugin.proxmox_bs_clients_discovery(
+        sections["section_proxmox_bs_snapshots"], sections["section_proxmox_bs_tasks"], sections["section_proxmox_bs"],
+        plugin.parse_proxmox_bs(tables["proxmox_bs_client_groups"]) if "proxmox_bs_client_groups" in tables else None,
+    )))
+    # every client has its own backup-id and comment in each namespace of each datastore, the
+    # comment names the host of its piggyback data
+    expected = 0 if piggyback else len(pbs.stores) * (pbs.namespace_count + 1) * pbs.clients
+    if clients != expected:
+        problems.append(f"{clients} clients, expected {expected}")
+    # a verify, sync and prune job on every datastore
+    jobs = sorted(service.item for service in plugin.discover_proxmox_bs_jobs(sections["section_proxmox_bs_tasks"]))
+    expected_jobs = sorted(f"{name} {store}" for name in ("Verify", "Sync", "Prune") for store in pbs.stores)
+    if jobs != expected_jobs:
+        problems.append(f"jobs {jobs}, expected {expected_jobs}")
+    return problems
+
+
+def load_plugin():
+    spec = importlib.util.spec_from_file_location("proxmox_bs", PLUGIN)
+    plugin = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(plugin)
+    return plugin
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-stores", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--namespaces", type=int, nargs="+", default=[0, 2, 8],
+                        help="namespaces per datastore besides the root")
+    parser.add_argument("--clients", type=int, default=20, help="clients per namespace")
+    parser.add_argument("--snapshots", type=int, default=14, help="snapshots per client")
+    parser.add_argument("--tasks", type=int, default=50, help="finished tasks")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds every PBS command or API request takes at least")
+    parser.add_argument("--collector", choices=("cli", "api"), default="cli",
+                        help="collector of the agent plugin, api reads a fake PBS REST API")
+    parser.add_argument("--runs", type=int, default=1, help="agent runs per combination, the best one counts")
+    parser.add_argument("--env", action="append", default=[], metavar="VAR=VALUE",
+                        help="agent plugin setting, e.g. PBS_PARALLEL=8")
+    parser.add_argument("--parse", action="store_true", help="check the output with the check plugin")
+    args = parser.parse_args()
+
+    plugin = load_plugin() if args.parse else None
+    settings = dict(setting.split("=", 1) for setting in args.env)
+
+    print(f"{'stores':>6} {'ns':>3} {'time s':>8} {'spawns':>6} {'manager':>7} {'client':>6} {'curl':>4} "
+          f"{'jq':>4} {'api':>4} {'output KiB':>10}  problems")
+    failed = False
+    for data_stores in args.data_stores:
+        for namespaces in args.namespaces:
+            pbs = FakePBS(data_stores, namespaces, args.clients, args.snapshots, args.tasks)
+            env = dict(
+                settings,
+                PBS_FAKE_DATA_STORES=str(data_stores),
+                PBS_FAKE_NAMESPACES=str(namespaces),
+                PBS_FAKE_CLIENTS=str(args.clients),
+                PBS_FAKE_SNAPSHOTS=str(args.snapshots),
+                PBS_FAKE_TASKS=str(args.tasks),
+                PBS_FAKE_LATENCY=str(args.latency),
+            )
+            output, elapsed, calls, kept = run_agent(env, args.runs, pbs if args.collector == "api" else None)
+            manager = sum(n for call, n in calls.items() if call.startswith("proxmox-backup-manager"))
+            client = sum(n for call, n in calls.items() if call.startswith("proxmox-backup-client"))
+            requests = sum(n for call, n in calls.items() if call.startswith("api "))
+            spawns = sum(calls.values()) - requests
+            problems = check_output(plugin, persisted(output, kept), pbs, settings.get("PBS_CLIENT_PIGGYBACK") == "yes") if plugin else []
+            failed = failed or bool(problems)
+            print(f"{data_stores:>6} {namespaces:>3} {elapsed:>8.2f} {spawns:>6} {manager:>7} {client:>6} "
+                  f"{calls['curl']:>4} {calls['jq']:>4} {requests:>4} {len(output.encode()) / 1024:>10.1f}  "
+                  f"{'; '.join(problems)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
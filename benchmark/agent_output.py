@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 inett GmbH
+# License: GNU General Public License v2
+# A file is subject to the terms and conditions defined in the file LICENSE,
+# which is part of this source code package.
+"""Synthetic proxmox_bs agent output
+
+Generates the output of agents/plugins/proxmox_bs (cli collector, snapshot
+list mode) for a Proxmox Backup Server of a given size, to benchmark the
+check plugins without a PBS. The fake PBS commands in benchmark/bin serve
+the same data.
+
+    benchmark/agent_output.py --data-stores 4 --clients 50 > proxmox_bs.out
+"""
+import argparse
+import json
+import random
+
+DAY = 86400
+
+
+def _upid(worker_type, worker_id, starttime, n):
+    worker_id = worker_id.replace(":", "\\x3a")
+    return f"UPID:pbs:{n:08X}:{n:08X}:00000000:{starttime:08X}:{worker_type}:{worker_id}:root@pam:"
+
+
+def _task(worker_type, worker_id, starttime, n, endtime=None, status="OK"):
+    task = {
+        "upid": _upid(worker_type, worker_id, starttime, n),
+        "node": "pbs",
+        "pid": n,
+        "pstart": n,
+        "starttime": starttime,
+        "worker_type": worker_type,
+        "worker_id": worker_id,
+        "user": "root@pam",
+    }
+    if endtime is not None:
+        task["endtime"] = endtime
+        task["status"] = status
+    return task
+
+
+class FakePBS:
+    """Replies of a PBS with the given number of datastores, namespaces per
+    datastore (besides the root), backup clients and snapshots per client in
+    every namespace and datastore root, and finished tasks. The same
+    arguments always give the same data."""
+
+    def __init__(self, data_stores=2, namespaces=2, clients=20, snapshots=14, tasks=50, slim=False,
+                 now=1760000000, seed=0):
+        self.stores = [f"store{d:02d}" for d in range(data_stores)]
+        self.namespace_count = namespaces
+        self.clients = clients
+        self.snapshot_count = snapshots
+        self.task_count = tasks
+        self.slim = slim
+        self.now = now
+        self.seed = seed
+
+    def versions(self):
+        return [{"ExtraInfo": "running kernel: 6.8.12-4-pve", "Package": "proxmox-backup-server", "Version": "3.3.2-1"}]
+
+    def datastore_list(self):
+        return [{"name": store, "path": f"/mnt/datastore/{store}", "comment": ""} for store in self.stores]
+
+    def namespaces(self, store):
+        """namespaces of a datastore, "" is its root"""
+        return [""] + [f"ns{k}" for k in range(1, self.namespace_count + 1)]
+
+    def gc_upid(self, store):
+        return _upid("garbage_collection", store, self.now - DAY, self.stores.index(store) + 1)
+
+    def tasks(self, running_only=False):
+        """the finished tasks and, as only running one, the GC of the last datastore"""
+        rnd = random.Random(self.seed)
+        tasks, n = [], len(self.stores)
+        for t in range(self.task_count):
+            n += 1
+            store = self.stores[t % len(self.stores)]
+            worker_type, worker_id = rnd.choice([
+                ("backup", f"{store}:vm/{100 + rnd.randrange(self.clients)}"),
+                ("verificationjob", f"{store}:v-{t:08x}"),
+                ("prunejob", store),
+                ("syncjob", f"remote:{store}:{store}::s-{t:08x}"),
+            ])
+            starttime = self.now - rnd.randrange(7 * DAY)
+            tasks.append(_task(worker_type, worker_id, starttime, n, starttime + rnd.randrange(3600)))
+        tasks.append(_task("garbage_collection", self.stores[-1], self.now - 600, n + 1))
+        if running_only:
+            return [task for task in tasks if "endtime" not in task]
+        return sorted(tasks, key=lambda task: task["starttime"], reverse=True)
+
+    def jobs(self, job_type):
+        """configured verify, sync or prune jobs, one per datastore"""
+        return [
+            {"id": f"{job_type[0]}-{store}", "store": store, "schedule": "daily"} for store in self.stores
+        ]
+
+    def gc_status(self, store):
+        return {
+            "upid": self.gc_upid(store),
+            "disk-bytes": 2199023255552,
+            "disk-chunks": 1048576,
+            "index-data-bytes": 8796093022208,
+            "index-file-count": self.clients * self.snapshot_count,
+            "pending-bytes": 0,
+            "pending-chunks": 0,
+            "removed-bad": 0,
+            "removed-bytes": 1073741824,
+            "removed-chunks": 512,
+            "still-bad": 0,
+        }
+
+    def task_log(self, upid):
+        if upid == self.gc_upid(self.stores[-1]):
+            # still running
+            return ["starting garbage collection on store " + self.stores[-1], "Start GC phase1 (mark used chunks)"]
+        return [
+            "starting garbage collection",
+            "Removed garbage: 1.00 GiB",
+            "Removed chunks: 512",
+            "Original data usage: 8.00 TiB",
+            "On-Disk usage: 2.00 TiB (25.00%)",
+            "On-Disk chunks: 1048576",
+            "Deduplication factor: 4.00",
+            "Average chunk size: 2.00 MiB",
+            "TASK OK",
+        ]
+
+    def _client(self, store, ns, c):
+        k = self.namespaces(store).index(ns)
+        backup_type = "ct" if c % 4 == 3 else "vm"
+        return backup_type, str(100 + c + 1000 * k), f"guest{c:03d} {store} ns{k}"
+
+    def _times(self, c):
+        return [self.now - s * DAY - c * 60 for s in range(self.snapshot_count)]
+
+    def groups(self, store, ns):
+        groups = []
+        for c in range(self.clients):
+            backup_type, backup_id, comment = self._client(store, ns, c)
+            groups.append({
+                "backup-type": backup_type,
+                "backup-id": backup_id,
+                "backup-count": self.snapshot_count,
+                "last-backup": self._times(c)[0],
+                "comment": comment,
+                "owner": "root@pam",
+                "files": ["client.log.blob", "drive-scsi0.img.fidx", "index.json.blob", "qemu-server.conf.blob"],
+            })
+        return groups
+
+    def snapshots(self, store, ns):
+        snapshots = []
+        for c in range(self.clients):
+            backup_type, backup_id, comment = self._client(store, ns, c)
+            for s, backup_time in enumerate(self._times(c)):
+                snapshot = {
+                    "backup-type": backup_type,
+                    "backup-id": backup_id,
+                    "backup-time": backup_time,
+                    "comment": comment,
+                    "size": 34359741364,
+                }
+                # 80% verified ok, 5% failed, 15% not verified
+                state = (c * 7 + s * 13 + len(ns)) % 20
+                if state < 17:
+                    upid = _upid("verificationjob", f"{store}:v-00000000", backup_time + 3600, s)
+                    snapshot["verification"] = {"state": "ok" if state < 16 else "failed", "upid": upid}
+                if not self.slim:
+                    snapshot.update({
+                        "files": [
+                            {"crypt-mode": "none", "filename": "qemu-server.conf.blob", "size": 512},
+                            {"crypt-mode": "none", "filename": "drive-scsi0.img.fidx", "size": 34359738368},
+                            {"crypt-mode": "none", "filename": "index.json.blob", "size": 436},
+                            {"crypt-mode": "none", "filename": "client.log.blob", "size": 2048},
+                        ],
+                        "owner": "root@pam",
+                        "protected": False,
+                    })
+                snapshots.append(snapshot)
+        return snapshots
+
+    def status(self, store):
+        return {"total": 10995116277760, "used": 2199023255552, "avail": 8796093022208}
+
+
+def _section(name, value, suffix=""):
+    return [f"==={name}==={suffix}", json.dumps(value, separators=(",", ":"))]
+
+
+def agent_output(data_stores=2, namespaces=2, clients=20, snapshots=14, tasks=50, slim=False, now=1760000000, seed=0):
+    """Agent output of a FakePBS. With finished tasks, the tasks are sent as
+    a task window (PBS_TASK_MODE=window)."""
+    pbs = FakePBS(data_stores, namespaces, clients, snapshots, tasks, slim, now, seed)
+    lines = ["<<<proxmox_bs:sep(0)>>>", "===requirements===", "0 proxmox-backup-manager", "0 proxmox-backup-client", "0 jq"]
+    lines += _section("proxmox-backup-manager versions", pbs.versions())
+    lines += _section("proxmox-backup-manager datastore list", pbs.datastore_list())
+    for store in pbs.stores:
+        lines += _section("proxmox-backup-client status", pbs.status(store), store)
+
+    lines += ["<<<proxmox_bs_tasks:sep(0)>>>"]
+    if tasks:
+        lines += _section("proxmox-backup-manager task window", {"since": now - 7 * DAY, "tasks": pbs.tasks()})
+    else:
+        lines += _section("proxmox-backup-manager task list", pbs.tasks(running_only=True))
+    for job_type in ("verify", "sync", "prune"):
+        lines += _section(f"proxmox-backup-manager {job_type}-job list", pbs.jobs(job_type))
+
+    lines += ["<<<proxmox_bs_gc:sep(0)>>>"]
+    for store in pbs.stores:
+        lines += _section("proxmox-backup-manager garbage-collection status", pbs.gc_status(store), store)
+    for store in pbs.stores:
+        lines += [f"===proxmox-backup-manager task log==={pbs.gc_upid(store)}"]
+        log = pbs.task_log(pbs.gc_upid(store))
+        # from the first "Removed " line on, like sed '/^Removed /,$!d' in the agent
+        removed = [n for n, line in enumerate(log) if line.startswith("Removed ")]
+        lines += log[removed[0]:] if removed else []
+
+    lines += ["<<<proxmox_bs_snapshots:sep(0)>>>"]
+    for store in pbs.stores:
+        # snapshots of a namespace carry its name, like the agent sends them
+        snapshot_list = [
+            {**snapshot, "ns": ns} if ns else snapshot
+            for ns in pbs.namespaces(store) for snapshot in pbs.snapshots(store, ns)
+        ]
+        lines += _section("proxmox-backup-client snapshot list", snapshot_list, store)
+    lines += ["===EOD===", "="]
+    return "\n".join(lines) + "\n"
+
+
+def legacy_agent_output(data_stores=2, namespaces=2, clients=20, snapshots=14, now=1760000000, seed=0):
+    """Output of a FakePBS as agents from before the split into sections send
+    it: everything in one proxmox_bs section without sep(0), only the running
+    tasks, and the group and snapshot lists of all namespaces of a datastore
+    without their namespace."""
+    pbs = FakePBS(data_stores, namespaces, clients, snapshots, 0, False, now, seed)
+    lines = ["<<<proxmox_bs>>>", "===requirements===", "0 proxmox-backup-manager", "0 proxmox-backup-client", "0 jq"]
+    lines += _section("proxmox-backup-manager versions", pbs.versions())
+    lines += _section("proxmox-backup-manager datastore list", pbs.datastore_list())
+    lines += _section("proxmox-backup-manager task list", pbs.tasks(running_only=True))
+    for store in pbs.stores:
+        namespaces = pbs.namespaces(store)
+        lines += _section("proxmox-backup-manager garbage-collection status", pbs.gc_status(store), store)
+        lines += _section("proxmox-backup-client list", [g for ns in namespaces for g in pbs.groups(store, ns)], store)
+        lines += _section(
+            "proxmox-backup-client snapshot list", [s for ns in namespaces for s in pbs.snapshots(store, ns)], store
+        )
+        lines += _section("proxmox-backup-client status", pbs.status(store), store)
+    for store in pbs.stores:
+        lines += [f"===proxmox-backup-manager task log==={pbs.gc_upid(store)}"]
+        log = pbs.task_log(pbs.gc_upid(store))
+        removed = [n for n, line in enumerate(log) if line.startswith("Removed ")]
+        lines += log[removed[0]:] if removed else []
+    lines += ["===EOD===", "="]
+    return "\n".join(lines) + "\n"
+
+
+def string_tables(output):
+    """The string tables Checkmk passes to the parse functions of the
+    proxmox_bs sections in agent output, by section name. Chunks of the same
+    section are joined, as Checkmk does, and lines of sections with sep(0)
+    are not split. Piggyback data for other hosts is left out."""
+    tables, table, split, piggyback = {}, None, True, False
+    for line in output.splitlines():
+        if line.startswith("<<<<") and line.endswith(">>>>"):
+            table, piggyback = None, line != "<<<<>>>>"
+        elif piggyback:
+            continue
+        elif line.startswith("<<<") and line.endswith(">>>"):
+            name, *options = line[3:-3].split(":")
+            table, split = tables.setdefault(name, []), "sep(0)" not in options
+        elif table is not None:
+            table.append(line.split() if split else [line])
+    return tables
+
+
+def persisted(output, kept):
+    """The agent output with the sections Checkmk keeps from earlier output,
+    as it does for sections with persist(...) in their header: those of the
+    output replace the ones in kept, the others of kept are added."""
+    name, chunks = None, {}
+    for line in output.splitlines(keepends=True):
+        if line.startswith("<<<") and not line.startswith("<<<<"):
+            options = line.rstrip("\n")[3:-3].split(":")
+            name = options[0] if any(option.startswith("persist(") for option in options) else None
+            if name is not None:
+                chunks[name] = ""
+        elif line.startswith("<<<<"):
+            name = None
+        if name is not None:
+            chunks[name] += line
+    kept.update(chunks)
+    return output + "".join(chunk for name, chunk in kept.items() if name not in chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-stores", type=int, default=2)
+    parser.add_argument("--namespaces", type=int, default=2, help="namespaces per datastore besides the root")
+    parser.add_argument("--clients", type=int, default=20, help="clients per namespace")
+    parser.add_argument("--snapshots", type=int, default=14, help="snapshots per client")
+    parser.add_argument("--tasks", type=int, default=50, help="finished tasks")
+    parser.add_argument("--slim", action="store_true", help="only the snapshot fields of PBS_SNAPSHOT_FIELDS=slim")
+    parser.add_argument("--legacy", action="store_true", help="output of agents from before the split into sections")
+    args = parser.parse_args()
+    if args.legacy:
+        print(legacy_agent_output(args.data_stores, args.namespaces, args.clients, args.snapshots), end="")
+        return
+    print(agent_output(args.data_stores, args.namespaces, args.clients, args.snapshots, args.tasks, args.slim), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 inett GmbH
+# License: GNU General Public License v2
+# A file is subject to the terms and conditions defined in the file LICENSE,
+# which is part of this source code package.
+"""Scaling benchmark of the proxmox_bs check plugins
+
+Times the parse, discovery and check functions on synthetic agent output of
+growing size and records their peak memory and the memory held by their
+result, i.e. by a parsed section. The check functions are run for
+every discovered item, so per-item scans of the whole section show up as
+growth faster than the output size.
+
+Needs the Checkmk Python modules, i.e. run it as the site user:
+
+    OMD[mysite]:~$ python3 benchmark/benchmark_checks.py
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from agent_output import agent_output, string_tables  # noqa: E402
+
+PLUGIN = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "cmk_addons_plugins", "proxmox_bs", "agent_based", "proxmox_bs.py",
+)
+
+# (name, datastores, namespaces, clients, snapshots per client, tasks)
+SCALES = (
+    ("small", 1, 0, 10, 7, 20),
+    ("medium", 2, 2, 25, 14, 200),
+    ("large", 4, 3, 50, 30, 1000),
+    ("huge", 8, 4, 100, 60, 5000),
+)
+
+CLIENT_PARAMS = {'bkp_age': ('fixed', (172800, 259200)), 'snapshot_min_ok': 1, 'backup_duration': ('no_levels', None)}
+JOB_PARAMS = {
+    'age': ('no_levels', None),
+    'duration': ('no_levels', None),
+    'running_time': ('fixed', (43200.0, 86400.0)),
+    'running_jobs': ('fixed', (2, 3)),
+    'other_tasks': ('no_levels', None),
+}
+
+
+def load_plugin():
+    spec = importlib.util.spec_from_file_location("proxmox_bs", PLUGIN)
+    plugin = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(plugin)
+    return plugin
+
+
+def measure(function, repeat):
+    """best time of repeat runs in seconds, peak memory of one run and memory
+    held by its result in bytes, and the result of the last run"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    kept = function()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return best, peak, retained, result
+
+
+# parse function of every section the agent sends
+SECTIONS = (
+    ("proxmox_bs", "parse_proxmox_bs_base"),
+    ("proxmox_bs_tasks", "parse_proxmox_bs_tasks"),
+    ("proxmox_bs_gc", "parse_proxmox_bs"),
+    ("proxmox_bs_snapshots", "parse_proxmox_bs_snapshots"),
+)
+
+
+def benchmark(plugin, scale, repeat, slim):
+    name, data_stores, namespaces, clients, snapshots, tasks = scale
+    tables = string_tables(agent_output(data_stores, namespaces, clients, snapshots, tasks, slim))
+
+    # a value store per service, as Checkmk keeps it
+    value_stores = {}
+    plugin.get_value_store = lambda: value_stores.setdefault(current[0], {})
+    current = [None]
+
+    def check_all(check, items, params, **section_kwargs):
+        for item in items:
+            current[0] = (check.__name__, item)
+            for _ in check(item, params, **section_kwargs):
+                pass
+
+    results = {}
+    sections = {}
+    for section_name, parse_function in SECTIONS:
+        parse = getattr(plugin, parse_function)
+        results[f'parse {section_name}'] = measure(lambda: parse(tables[section_name]), repeat)
+        sections[f'section_{section_name}'] = results[f'parse {section_name}'][3]
+    client_sections = {key: sections[key] for key in ('section_proxmox_bs_snapshots', 'section_proxmox_bs_tasks', 'section_proxmox_bs')}
+    # only sent with snapshot deltas
+    client_sections['section_proxmox_bs_client_groups'] = None
+    results['discover_proxmox_bs'] = measure(lambda: [s.item for s in plugin.discover_proxmox_bs(**sections)], repeat)
+    results['proxmox_bs_clients_discovery'] = measure(
+        lambda: [s.item for s in plugin.proxmox_bs_clients_discovery(**client_sections)], repeat
+    )
+    items = results['discover_proxmox_bs'][3]
+    client_items = results['proxmox_bs_clients_discovery'][3]
+    results['check_proxmox_bs'] = measure(
+        lambda: check_all(plugin.check_proxmox_bs, items, plugin.FILESYSTEM_DEFAULT_LEVELS, **sections), repeat
+    )
+    results['proxmox_bs_clients_checks'] = measure(
+        lambda: check_all(plugin.proxmox_bs_clients_checks, client_items, CLIENT_PARAMS, **client_sections), repeat
+    )
+    job_sections = {'section_proxmox_bs_tasks': sections['section_proxmox_bs_tasks']}
+    results['discover_proxmox_bs_jobs'] = measure(
+        lambda: [s.item for s in plugin.discover_proxmox_bs_jobs(**job_sections)], repeat
+    )
+    job_items = results['discover_proxmox_bs_jobs'][3]
+    results['check_proxmox_bs_jobs'] = measure(
+        lambda: check_all(plugin.check_proxmox_bs_jobs, job_items, JOB_PARAMS, **job_sections), repeat
+    )
+    total_snapshots = data_stores * (namespaces + 1) * clients * snapshots
+    return name, sum(len(table) for table in tables.values()), total_snapshots, len(items), len(client_items), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the best one counts")
+    parser.add_argument("--scales", nargs="+", choices=[s[0] for s in SCALES], default=[s[0] for s in SCALES])
+    parser.add_argument("--slim", action="store_true", help="agent output with PBS_SNAPSHOT_FIELDS=slim")
+    args = parser.parse_args()
+
+    plugin = load_plugin()
+    runs = [benchmark(plugin, scale, args.repeat, args.slim) for scale in SCALES if scale[0] in args.scales]
+
+    print(f"{'scale':<8} {'snapshots':>9} {'items':>5} {'clients':>7}  {'function':<30} {'time ms':>10} "
+          f"{'peak MiB':>9} {'kept MiB':>9} {'us/snapshot':>11}")
+    for name, _lines, total_snapshots, items, client_items, results in runs:
+        for function, (elapsed, peak, retained, _) in results.items():
+            print(f"{name:<8} {total_snapshots:>9} {items:>5} {client_items:>7}  {function:<30} "
+                  f"{elapsed * 1000:>10.2f} {peak / 1048576:>9.2f} {retained / 1048576:>9.2f} "
+                  f"{elapsed * 1e6 / total_snapshots:>11.3f}")
+
+    # growth of every function from the smallest to the largest scale,
+    # relative to the growth of the snapshot count. Clearly above 1 means the
+    # cost grows faster than the agent output.
+    if len(runs) > 1:
+        first, last = runs[0], runs[-1]
+        size = last[2] / first[2]
+        print(f"\ngrowth {first[0]} -> {last[0]}, snapshots x{size:.1f}")
+        for function in first[5]:
+            growth = last[5][function][0] / first[5][function][0]
+            print(f"  {function:<30} time x{growth:>8.1f}  relative {growth / size:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 inett GmbH
+# License: GNU General Public License v2
+# A file is subject to the terms and conditions defined in the file LICENSE,
+# which is part of this source code package.
+"""Fake PBS REST API
+
+Serves the data of agent_output.FakePBS over plain HTTP for the requests the
+agent plugin (PBS_COLLECTOR=api) and the special agent send, with keep-alive
+connections like the PBS proxy. Requests without the ticket of a login are
+answered with 401.
+
+    benchmark/fake_api.py --port 18007 --data-stores 4
+    PBS_COLLECTOR=api PBS_API_URL=http://127.0.0.1:18007 agents/plugins/proxmox_bs
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agent_output import FakePBS
+
+TICKET = "PBS:monitoring@pbs:00000000::fake"
+
+
+class FakeApiServer(ThreadingHTTPServer):
+    """HTTP server answering for pbs. Every request takes at least latency
+    seconds and is appended to the file calls as "api METHOD PATH"."""
+    daemon_threads = True
+
+    def __init__(self, address, pbs, latency=0.0, calls=None):
+        super().__init__(address, FakeApiHandler)
+        self.pbs = pbs
+        self.latency = latency
+        self.calls = calls
+        self.lock = threading.Lock()
+
+    def record(self, method, path):
+        if self.calls:
+            with self.lock, open(self.calls, "a") as f:
+                f.write(f"api {method} {path}\n")
+
+
+def reply(pbs, path, query):
+    """data of the reply to GET path, None if the fake PBS does not know it"""
+    parts = path.split("/")[3:]
+    ns = query.get("ns", "")
+    if parts == ["nodes", "localhost", "apt", "versions"]:
+        return pbs.versions()
+    if parts == ["config", "datastore"]:
+        return pbs.datastore_list()
+    if parts in (["config", "verify"], ["config", "sync"], ["config", "prune"]):
+        return pbs.jobs(parts[1])
+    if parts == ["config", "tape-backup-job"]:
+        return []
+    if parts == ["nodes", "localhost", "tasks"]:
+        if query.get("running") == "1":
+            return pbs.tasks(running_only=True)
+        since = int(query.get("since", 0))
+        return [task for task in pbs.tasks() if task["starttime"] >= since]
+    if parts[:3] == ["nodes", "localhost", "tasks"] and parts[4:] == ["log"]:
+        return [{"n": n, "t": line} for n, line in enumerate(pbs.task_log(parts[3]), 1)]
+    if parts[:2] == ["admin", "datastore"] and len(parts) == 4 and parts[2] in pbs.stores:
+        store = parts[2]
+        if parts[3] == "namespace":
+            return [{"ns": name} for name in pbs.namespaces(store)]
+        if ns not in pbs.namespaces(store):
+            return None
+        return {
+            "status": lambda: pbs.status(store),
+            "gc": lambda: pbs.gc_status(store),
+            "groups": lambda: pbs.groups(store, ns),
+            "snapshots": lambda: pbs.snapshots(store, ns),
+        }.get(parts[3], lambda: None)()
+    return None
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def send(self, code, data=None):
+        body = json.dumps({"data": data}).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self, method):
+        start = time.monotonic()
+        url = urllib.parse.urlsplit(self.path)
+        path = urllib.parse.unquote(url.path)
+        self.server.record(method, path)
+        if method == "POST":
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if path.startswith("/api2/json/access/ticket"):
+            code, data = (200, {"ticket": TICKET, "username": "monitoring@pbs"}) if method == "POST" else (404, None)
+        elif f"PBSAuthCookie={urllib.parse.quote(TICKET, safe='')}" not in (self.headers.get("Cookie") or "") \
+                and not (self.headers.get("Authorization") or "").startswith("PBSAPIToken"):
+            code, data = 401, None
+        else:
+            data = reply(self.server.pbs, path, dict(urllib.parse.parse_qsl(url.query)))
+            code = 404 if data is None else 200
+        latency = self.server.latency - (time.monotonic() - start)
+        if latency > 0:
+            time.sleep(latency)
+        self.send(code, data)
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(pbs, latency=0.0, calls=None, port=0):
+    """FakeApiServer for pbs on 127.0.0.1 (on a free port by default), serving
+    in a background thread"""
+    server = FakeApiServer(("127.0.0.1", port), pbs, latency, calls)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=18007)
+    parser.add_argument("--data-stores", type=int, default=2)
+    parser.add_argument("--namespaces", type=int, default=2, help="namespaces per datastore besides the root")
+    parser.add_argument("--clients", type=int, default=20, help="clients per namespace")
+    parser.add_argument("--snapshots", type=int, default=14, help="snapshots per client")
+    parser.add_argument("--tasks", type=int, default=50, help="finished tasks")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every request takes at least")
+    args = parser.parse_args()
+    pbs = FakePBS(args.data_stores, args.namespaces, args.clients, args.snapshots, args.tasks)
+    server = FakeApiServer(("127.0.0.1", args.port), pbs, args.latency)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 inett GmbH
+# License: GNU General Public License v2
+# A file is subject to the terms and conditions defined in the file LICENSE,
+# which is part of this source code package.
+"""Fake proxmox-backup-manager and proxmox-backup-client
+
+Serves the data of agent_output.FakePBS for the commands the agent plugin
+runs. benchmark/bin holds the commands, which call main() with their name.
+The fake PBS is configured through the environment:
+
+PBS_FAKE_DATA_STORES, PBS_FAKE_NAMESPACES, PBS_FAKE_CLIENTS,
+PBS_FAKE_SNAPSHOTS, PBS_FAKE_TASKS: size of the PBS, see FakePBS
+PBS_FAKE_LATENCY: seconds every call takes at least (default 0)
+PBS_FAKE_CALLS: file every call is appended to, one line per call
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from agent_output import FakePBS  # noqa: E402
+
+# options taking a value, anything else starting with "--" is a flag
+_OPTIONS = ("--output-format", "--repository", "--ns", "--limit", "--start")
+
+
+def _arguments(argv):
+    """positional arguments and options of a command line"""
+    positional, options = [], {}
+    i = 0
+    while i < len(argv):
+        if argv[i] in _OPTIONS:
+            options[argv[i][2:]] = argv[i + 1]
+            i += 2
+        elif argv[i].startswith("--"):
+            options[argv[i][2:]] = True
+            i += 1
+        else:
+            positional.append(argv[i])
+            i += 1
+    return positional, options
+
+
+def fake_pbs():
+    return FakePBS(
+        data_stores=int(os.environ.get("PBS_FAKE_DATA_STORES", 2)),
+        namespaces=int(os.environ.get("PBS_FAKE_NAMESPACES", 2)),
+        clients=int(os.environ.get("PBS_FAKE_CLIENTS", 20)),
+        snapshots=int(os.environ.get("PBS_FAKE_SNAPSHOTS", 14)),
+        tasks=int(os.environ.get("PBS_FAKE_TASKS", 50)),
+    )
+
+
+def manager(pbs, positional, options):
+    if positional == ["versions"]:
+        return pbs.versions()
+    if positional == ["datastore", "list"]:
+        return pbs.datastore_list()
+    if positional == ["task", "list"]:
+        tasks = pbs.tasks(running_only=not options.get("all"))
+        limit = int(options.get("limit", 50))
+        return tasks[:limit] if limit else tasks
+    if positional in (["verify-job", "list"], ["sync-job", "list"], ["prune-job", "list"]):
+        return pbs.jobs(positional[0].split("-")[0])
+    if positional[:2] == ["garbage-collection", "status"] and len(positional) == 3:
+        return pbs.gc_status(positional[2])
+    if positional[:2] == ["task", "log"] and len(positional) == 3:
+        return "\n".join(pbs.task_log(positional[2]))
+    return None
+
+
+def client(pbs, positional, options):
+    repository = options.get("repository", os.environ.get("PBS_REPOSITORY", ""))
+    store = repository.rsplit(":", 1)[-1]
+    ns = options.get("ns", "")
+    if positional in (["login"], ["logout"]):
+        return ""
+    if store not in pbs.stores:
+        return None
+    if positional == ["namespace", "list"]:
+        return "\n".join(name for name in pbs.namespaces(store) if name)
+    if positional == ["list"]:
+        return pbs.groups(store, ns)
+    if positional == ["snapshot", "list"]:
+        return pbs.snapshots(store, ns)
+    if positional == ["status"]:
+        return pbs.status(store)
+    return None
+
+
+def main(command):
+    start = time.monotonic()
+    calls = os.environ.get("PBS_FAKE_CALLS")
+    if calls:
+        with open(calls, "a") as f:
+            f.write(" ".join([command] + sys.argv[1:]) + "\n")
+
+    positional, options = _arguments(sys.argv[1:])
+    reply = {"proxmox-backup-manager": manager, "proxmox-backup-client": client}[command](
+        fake_pbs(), positional, options
+    )
+
+    latency = float(os.environ.get("PBS_FAKE_LATENCY", 0)) - (time.monotonic() - start)
+    if latency > 0:
+        time.sleep(latency)
+    if reply is None:
+        sys.stderr.write(f"{command}: unsupported command {' '.join(sys.argv[1:])}\n")
+        return 1
+    if reply != "":
+        print(reply if isinstance(reply, str) else json.dumps(reply))
+    return 0
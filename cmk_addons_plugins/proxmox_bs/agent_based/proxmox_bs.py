@@ -18,106 +18,532 @@ from cmk.agent_based.v2 import (
     Metric,
     ServiceLabel,
     render,
+    check_levels,
     get_value_store,
 )
 from cmk.plugins.lib.df import df_check_filesystem_single, FILESYSTEM_DEFAULT_LEVELS
-import re
+from array import array
 import json
+import re
 
 import time
-from datetime import datetime
-
-proxmox_bs_subsection_start = re.compile("^===")
-proxmox_bs_subsection_int = re.compile("===.*$")
-proxmox_bs_subsection_end = re.compile("^=")
 
 Section = dict
 
-# depends on OUTPUT_FORMAT="--output-format json" in agent. Other output formats crashing the check
+
+def _subsection_json(parsed, name, suffix, lines):
+    """Decode the JSON payload of a subsection, None if there is none"""
+    if not lines:
+        return None
+    try:
+        if len(lines) == 1 and len(lines[0]) == 1:
+            # one untokenized line, as sent with sep(0)
+            return json.loads(lines[0][0])
+        return json.loads("\n".join(" ".join(line) for line in lines))
+    except json.decoder.JSONDecodeError as e:
+        parsed['errors'].append((name, suffix, str(e)))
+        return None
+
+
+def _parse_global(parsed, name, suffix, lines):
+    value = _subsection_json(parsed, name, suffix, lines)
+    if value is not None:
+        parsed[name.split("_", 1)[-1]] = value
+
+
+def _parse_data_store(parsed, name, suffix, lines):
+    data_store = parsed['data_stores'].setdefault(suffix, {})
+    value = _subsection_json(parsed, name, suffix, lines)
+    if value is not None:
+        data_store[name] = value
+
+
+def _parse_task_log(parsed, name, suffix, lines):
+    task = parsed['tasks'].setdefault(suffix, {})
+    for line in lines:
+        line = " ".join(line)
+        if ":" in line:
+            key, _, value = line.partition(":")
+            task[key] = value
+        else:
+            task['task_ok'] = line == "TASK OK"
+
+
+def _parse_ignore(parsed, name, suffix, lines):
+    pass
+
+
+# handlers by subsection name, i.e. the command in the ===...=== header with
+# blanks replaced by "_". Subsections with a suffix after the command (===...===fs01)
+# not listed here belong to the datastore named by the suffix, others are stored
+# under the command name without the program.
+_SUBSECTION_HANDLERS = {
+    "requirements": _parse_ignore,
+    "EOD": _parse_ignore,
+    "proxmox-backup-manager_versions": _parse_global,
+    "proxmox-backup-manager_datastore_list": _parse_global,
+    "proxmox-backup-manager_task_list": _parse_global,
+    "proxmox-backup-manager_task_window": _parse_global,
+    "proxmox-backup-manager_task_log": _parse_task_log,
+    "proxmox-backup-manager_verify-job_list": _parse_global,
+    "proxmox-backup-manager_sync-job_list": _parse_global,
+    "proxmox-backup-manager_prune-job_list": _parse_global,
+    "proxmox-tape_backup-job_list": _parse_global,
+    "proxmox-backup-manager_garbage-collection_status": _parse_data_store,
+    "proxmox-backup-client_list": _parse_data_store,
+    "proxmox-backup-client_snapshot_list": _parse_data_store,
+    "proxmox-backup-client_snapshot_delta": _parse_data_store,
+    "proxmox-backup-client_snapshot_summary": _parse_data_store,
+    "proxmox-backup-client_groups": _parse_data_store,
+    "proxmox-backup-client_status": _parse_data_store,
+    "agent_timing": _parse_global,
+    "piggyback": _parse_global,
+}
+
+
+# Datastore a task works on, taken from its worker id, e.g. "fs01" for a
+# garbage collection, "fs01:v-ee54fa7e-61f0" for a verification job or
+# "remote:remote_store:fs01:ns:s-1a2b3c4d-5e6f" for a sync job
+def _task_data_store(task):
+    worker_id = task.get('worker_id') or ""
+    parts = worker_id.split(":")
+    if task.get('worker_type') == "syncjob":
+        return parts[2] if len(parts) > 2 else None
+    return parts[0] or None
+
+
+# Index of the task list by datastore and worker type, built once in the parse
+# step: {"fs01": {"garbage_collection": {"running": [...], "last": {...}}}}
+# "last" is the most recently finished task.
+def _index_tasks(task_list):
+    index = {}
+    for task in task_list:
+        data_store = _task_data_store(task)
+        if data_store is None:
+            continue
+        tasks = index.setdefault(data_store, {}).setdefault(task.get('worker_type'), {'running': [], 'last': None})
+        if "endtime" not in task:
+            if "starttime" in task:
+                tasks['running'].append(task)
+        elif tasks['last'] is None or tasks['last']['endtime'] < task['endtime']:
+            tasks['last'] = task
+    return index
+
+
+# Backup group of a backup task, taken from its worker id: datastore,
+# namespace ("" for the datastore root), backup type and backup id, e.g.
+# ("fs01", "", "vm", "103") for "fs01:vm/103". The namespace of a group in one
+# is put between datastore and type, e.g. "fs01:ns1/sub:vm/103".
+def _task_backup_group(task):
+    data_store, _, group = (task.get('worker_id') or "").partition(":")
+    parts = re.split(r"[:/]", group)
+    if not data_store or len(parts) < 2:
+        return None
+    return (data_store, "/".join(parts[:-2]), parts[-2], parts[-1])
+
+
+# Index of the backup tasks by backup group, built once in the parse step:
+# {("fs01", "", "vm", "103"): {"running": [...], "last": {...}}}, like a
+# datastore task index
+def _index_backups(task_list):
+    index = {}
+    for task in task_list:
+        if task.get('worker_type') != "backup":
+            continue
+        group = _task_backup_group(task)
+        if group is None:
+            continue
+        tasks = index.setdefault(group, {'running': [], 'last': None})
+        if "endtime" not in task:
+            if "starttime" in task:
+                tasks['running'].append(task)
+        elif tasks['last'] is None or tasks['last']['endtime'] < task['endtime']:
+            tasks['last'] = task
+    return index
+
+
+# Job types checked by the "PBS Job" services: name in the item, worker type of
+# their tasks and the subsection with their configuration
+PROXMOX_BS_JOBS = (
+    ("Verify", "verificationjob", "verify-job_list"),
+    ("Sync", "syncjob", "sync-job_list"),
+    ("Prune", "prunejob", "prune-job_list"),
+    ("Tape backup", "tape-backup-job", "backup-job_list"),
+)
+
+
+# Configured jobs by worker type and datastore, built once in the parse step:
+# {"verificationjob": {"fs01": ["v-ee54fa7e-61f0"]}}
+def _index_jobs(parsed):
+    index = {}
+    for _name, worker_type, key in PROXMOX_BS_JOBS:
+        for job in parsed.get(key) or []:
+            if job.get('store'):
+                index.setdefault(worker_type, {}).setdefault(job['store'], []).append(job.get('id', ""))
+    return index
+
+
+# Task index of a datastore. A task window only holds the tasks started since
+# the previous agent run and the running ones, so the last finished task of
+# every worker type is merged with the one kept in the value store.
+def proxmox_bs_data_store_tasks(value_store, section, data_store):
+    tasks = section['task_index'].get(data_store, {})
+    if 'task_window' not in section:
+        return tasks
+    merged = {
+        worker_type: {'running': [], 'last': last}
+        for worker_type, last in value_store.get('last_tasks', {}).items()
+    }
+    for worker_type, current in tasks.items():
+        last = merged.get(worker_type, {}).get('last')
+        if current['last'] is not None and (last is None or last['endtime'] < current['last']['endtime']):
+            last = current['last']
+        merged[worker_type] = {'running': current['running'], 'last': last}
+    value_store['last_tasks'] = {
+        worker_type: tasks['last'] for worker_type, tasks in merged.items() if tasks['last'] is not None
+    }
+    return merged
+
+
+# running and last finished tasks of a worker type in a datastore task index
+def proxmox_bs_tasks(data_store_tasks, worker_type):
+    return data_store_tasks.get(worker_type, {'running': [], 'last': None})
+
+
+# The agent sends its data in several sections, each made of ===...===
+# subsections parsed the same way:
+#   proxmox_bs            versions, datastore list and usage of every datastore,
+#                         from older agents also the task list, the GC task logs
+#                         and the group and snapshot lists of every datastore
+#   proxmox_bs_tasks      task list or task window
+#   proxmox_bs_gc         GC status of every datastore and the GC task logs
+#   proxmox_bs_snapshots  snapshots of every datastore
+#   proxmox_bs_client_groups
+#                         backup groups of the clients of every datastore
+#                         the snapshot deltas are based on, kept by Checkmk
+#   proxmox_bs_timing     run time of the agent plugin
+# so a check only gets the data it needs, and malformed data in one section
+# does not affect the others.
+# The sections are sent with sep(0), so every line arrives as one untokenized
+# field and a JSON payload is decoded as is, whitespace in strings included.
+# Output of older agents, split at whitespace, is joined again.
+# depends on OUTPUT_FORMAT="--output-format json" in agent. Other output formats
+# are reported in parsed['errors'] as (subsection, suffix, error)
 def parse_proxmox_bs(string_table: StringTable) -> Section:
-    parsed = {'tasks': {}, 'data_stores': {}}
-    key = ""
+    parsed = {'tasks': {}, 'data_stores': {}, 'errors': []}
+    handler, name, suffix, lines = None, "", "", []
     for line in string_table:
         if line == ["="] or line == [""]:
             continue
         elif line[0].startswith("==="):
-            key = "_".join(line).strip("=")
-            if key.__contains__("===") and not key.__contains__("proxmox-backup-manager_task_log"):
-                keys = key.split("===")
-                if not parsed['data_stores'].__contains__(keys[1]):
-                    parsed['data_stores'][keys[1]] = {keys[0]: {}}
-        elif key == "requirements":
-            continue
-        else:
-            if key.__contains__("==="):
-                if not key.__contains__("proxmox-backup-manager_task_log"):
-                    keys = key.split("===")
-                    try:
-                        parsed['data_stores'][keys[1]][keys[0]] = json.loads(" ".join(line))
-                    except json.decoder.JSONDecodeError:
-                        pass
-                else:
-                    tmp_key = key.split("===")[1]
-                    line = " ".join(line)
-                    if not parsed['tasks'].__contains__(tmp_key):
-                        parsed['tasks'][tmp_key] = {}
-                    if line.__contains__(":"):
-                        line = line.split(":")
-                        parsed['tasks'][tmp_key][line[0]] = line[1]
-                    else:
-                        if line == "TASK OK":
-                            parsed['tasks'][tmp_key]['task_ok'] = True
-                        else:
-                            parsed['tasks'][tmp_key]['task_ok'] = False
+            if handler is not None:
+                handler(parsed, name, suffix, lines)
+            name, _, suffix = "_".join(" ".join(line).split()).strip("=").partition("===")
+            handler = _SUBSECTION_HANDLERS.get(name, _parse_data_store if suffix else _parse_global)
+            lines = []
+        elif handler is not None:
+            lines.append(line)
+    if handler is not None:
+        handler(parsed, name, suffix, lines)
+    return parsed
+
+
+def _index_task_section(parsed):
+    task_list = parsed.get('task_list', []) + parsed.get('task_window', {}).get('tasks', [])
+    parsed['task_index'] = _index_tasks(task_list)
+    parsed['backups'] = _index_backups(task_list)
+    parsed['jobs'] = _index_jobs(parsed)
+
+
+def parse_proxmox_bs_tasks(string_table: StringTable) -> Section:
+    parsed = parse_proxmox_bs(string_table)
+    _index_task_section(parsed)
+    return parsed
+
+
+# verification state of a snapshot in ProxmoxBsSnapshots.state
+PROXMOX_BS_VERIFY_NONE = 0
+PROXMOX_BS_VERIFY_OK = 1
+PROXMOX_BS_VERIFY_FAILED = 2
+PROXMOX_BS_VERIFY_UNKNOWN = 3
+
+
+class ProxmoxBsSnapshots:
+    """Snapshot list of a datastore in columns, one entry per snapshot:
+    backup time, client (index into clients, -1 without backup-id or comment),
+    backup group (index into group_keys), size in bytes (0 if not sent) and
+    verification state. Snapshots with failed or unknown verification are kept
+    in problems as backup-type, backup-id and verification. group_keys tells
+    the backup groups apart by namespace ("" for the datastore root),
+    backup-type and backup-id, groups is their number. The positions of the
+    snapshots of every group are indexed on first use."""
+    __slots__ = ('clients', 'client', 'group', 'time', 'size', 'state', 'problems', 'group_keys', 'groups', 'by_group')
+
+    def __init__(self, snapshot_list):
+        index = {}
+        group_index = {}
+        self.clients = []
+        self.client = array('l')
+        self.group = array('l')
+        self.time = array('q')
+        self.size = array('q')
+        self.state = bytearray()
+        self.problems = []
+        self.group_keys = []
+        self.by_group = None
+        for e in snapshot_list:
+            if "backup-id" in e and "comment" in e:
+                key = (e["backup-id"], e["comment"])
+                client = index.get(key)
+                if client is None:
+                    client = index[key] = len(self.clients)
+                    self.clients.append(key)
+            else:
+                client = -1
+            self.client.append(client)
+            key = (e.get("ns") or "", e["backup-type"], e["backup-id"])
+            group = group_index.get(key)
+            if group is None:
+                group = group_index[key] = len(self.group_keys)
+                self.group_keys.append(key)
+            self.group.append(group)
+            self.time.append(int(e["backup-time"]))
+            self.size.append(int(e.get("size") or 0))
+
+            verification = e.get("verification")
+            if verification is None:
+                state = PROXMOX_BS_VERIFY_NONE
             else:
-                try:
-                    parsed[key.split("_", 1)[1]] = json.loads(" ".join(line))
-                except json.decoder.JSONDecodeError:
-                    pass
+                verify_state = verification.get("state", "na")
+                if verify_state == "ok":
+                    state = PROXMOX_BS_VERIFY_OK
+                else:
+                    state = PROXMOX_BS_VERIFY_FAILED if verify_state == "failed" else PROXMOX_BS_VERIFY_UNKNOWN
+                    self.problems.append({
+                        "backup-type": e["backup-type"],
+                        "backup-id": e["backup-id"],
+                        "verification": {"state": verification.get("state"), "upid": verification.get("upid")},
+                    })
+            self.state.append(state)
+        self.groups = len(self.group_keys)
+
+    def __len__(self):
+        return len(self.state)
+
+    def count(self, state):
+        return self.state.count(state)
+
+    def client_groups(self):
+        """pairs of client and backup group (as in group_keys) of the snapshots"""
+        return {
+            (self.clients[client], self.group_keys[group])
+            for client, group in set(zip(self.client, self.group)) if client >= 0
+        }
+
+    def newest(self, group, start, end):
+        """backup time and size of the newest snapshot of the backup group
+        (namespace, backup-type, backup-id) taken between start and end, None
+        if there is none"""
+        if self.by_group is None:
+            self.by_group = {}
+            for position, g in enumerate(self.group):
+                self.by_group.setdefault(self.group_keys[g], []).append(position)
+        newest = None
+        for position in self.by_group.get(group, []):
+            backup_time = self.time[position]
+            if start <= backup_time <= end and (newest is None or newest[0] < backup_time):
+                newest = (backup_time, self.size[position])
+        return newest
+
+
+def _index_snapshot_section(parsed):
+    # only the columns are kept, not the decoded snapshots
+    for data_store in parsed['data_stores'].values():
+        if 'proxmox-backup-client_snapshot_list' in data_store:
+            data_store['proxmox-backup-client_snapshot_list'] = ProxmoxBsSnapshots(
+                data_store['proxmox-backup-client_snapshot_list']
+            )
+    parsed['clients'] = proxmox_bs_clients_index(parsed)
+    parsed['client_groups'] = proxmox_bs_client_groups(parsed)
+
+
+def parse_proxmox_bs_snapshots(string_table: StringTable) -> Section:
+    parsed = parse_proxmox_bs(string_table)
+    _index_snapshot_section(parsed)
+    return parsed
+
+
+# Agents from before the split into sections send everything in the
+# proxmox_bs section: the task list, the GC task logs and the group and
+# snapshot lists besides versions, datastores and usage. Their task list and
+# snapshot lists are indexed like the sections of their own, and the checks
+# take them from here if those sections are missing.
+def parse_proxmox_bs_base(string_table: StringTable) -> Section:
+    parsed = parse_proxmox_bs(string_table)
+    if 'task_list' in parsed:
+        _index_task_section(parsed)
+    if any('proxmox-backup-client_snapshot_list' in data_store for data_store in parsed['data_stores'].values()):
+        _index_snapshot_section(parsed)
     return parsed
 
 
+# the proxmox_bs section of an older agent standing in for the section with
+# the index key, None if there is none
+def proxmox_bs_legacy_section(section_proxmox_bs, key):
+    if section_proxmox_bs is not None and key in section_proxmox_bs:
+        return section_proxmox_bs
+    return None
+
+
 agent_section_proxmox_bs = AgentSection(
     name="proxmox_bs",
+    parse_function=parse_proxmox_bs_base,
+)
+
+
+agent_section_proxmox_bs_tasks = AgentSection(
+    name="proxmox_bs_tasks",
+    parse_function=parse_proxmox_bs_tasks,
+)
+
+
+agent_section_proxmox_bs_gc = AgentSection(
+    name="proxmox_bs_gc",
     parse_function=parse_proxmox_bs,
 )
 
 
-def discover_proxmox_bs(section: Section) -> DiscoveryResult:
-    for key in section['data_stores'].keys():
+agent_section_proxmox_bs_snapshots = AgentSection(
+    name="proxmox_bs_snapshots",
+    parse_function=parse_proxmox_bs_snapshots,
+)
+
+
+agent_section_proxmox_bs_client_groups = AgentSection(
+    name="proxmox_bs_client_groups",
+    parse_function=parse_proxmox_bs,
+)
+
+
+agent_section_proxmox_bs_timing = AgentSection(
+    name="proxmox_bs_timing",
+    parse_function=parse_proxmox_bs,
+)
+
+
+# With PBS_SNAPSHOT_MODE=delta the agent sends only the changes of a snapshot
+# list since its last complete list, the base, and the complete list once in
+# a while:
+# {"serial": 5, "base": 3, "full": false,
+#  "added": {"vm/103/1742890730": {...}}, "changed": {...},
+#  "removed": ["vm/103/1742550846"],
+#  "groups_added": [["103", "pfsense01", "", "vm"]], "groups_removed": []}
+# The snapshots of the base are kept in the value store under key, and the
+# full list is the base with the latest changes applied. If accept is given,
+# only the snapshots accepted by it are kept. A value store without the base,
+# e.g. one created since, gives an incomplete list until the next complete
+# list, unless seed tells that none of the accepted snapshots are in the base.
+# Older agents send the changes since their previous run, "previous" instead
+# of "base", which are applied to the list of the last check.
+# Returns the snapshot list, as ProxmoxBsSnapshots for a list sent in full, and
+# whether it is known to be complete.
+def proxmox_bs_snapshots(value_store, key, data_store, accept=None, seed=False):
+    if 'proxmox-backup-client_snapshot_list' in data_store:
+        return data_store['proxmox-backup-client_snapshot_list'], True
+
+    delta = data_store.get('proxmox-backup-client_snapshot_delta')
+    if not delta:
+        return [], False
+
+    last = value_store.get(key)
+    if 'base' in delta:
+        if delta['full']:
+            base, complete = {}, True
+        elif last is not None and last.get('base') == delta['base']:
+            base, complete = last['snapshots'], last['complete']
+        elif seed:
+            base, complete = {}, True
+        else:
+            base, complete = (last or {}).get('snapshots', {}), False
+        snapshots = dict(base)
+    elif delta['full']:
+        snapshots, complete = {}, True
+    elif last is not None and last['serial'] == delta['serial']:
+        # same agent output as in the last check
+        return list(last['snapshots'].values()), last['complete']
+    elif last is not None and last['serial'] == delta['previous']:
+        snapshots, complete = last['snapshots'], last['complete']
+    else:
+        # an agent run was missed, apply what we have until the next full list
+        snapshots, complete = (last or {}).get('snapshots', {}), False
+
+    for k in delta['removed']:
+        snapshots.pop(k, None)
+    for changes in (delta['added'], delta['changed']):
+        for k, e in changes.items():
+            if accept is None or accept(e):
+                snapshots[k] = e
+            else:
+                snapshots.pop(k, None)
+
+    if 'base' not in delta:
+        value_store[key] = {'serial': delta['serial'], 'complete': complete, 'snapshots': snapshots}
+    elif complete and (last is None or last.get('base') != delta['base']):
+        # the base itself, or a base without any accepted snapshot
+        value_store[key] = {'base': delta['base'], 'complete': True, 'snapshots': snapshots if delta['full'] else {}}
+    return list(snapshots.values()), complete
+
+
+# the different forms the agent sends the snapshots of a datastore in
+PROXMOX_BS_SNAPSHOT_SUBSECTIONS = (
+    'proxmox-backup-client_snapshot_list',
+    'proxmox-backup-client_snapshot_delta',
+    'proxmox-backup-client_snapshot_summary',
+)
+
+
+# sections missing from the agent output are parsed as empty
+PROXMOX_BS_NO_SECTION = {'tasks': {}, 'data_stores': {}, 'errors': [], 'task_index': {}, 'jobs': {}, 'clients': {}}
+
+
+def discover_proxmox_bs(
+    section_proxmox_bs: Section | None,
+    section_proxmox_bs_tasks: Section | None,
+    section_proxmox_bs_gc: Section | None,
+    section_proxmox_bs_snapshots: Section | None,
+) -> DiscoveryResult:
+    for key in (section_proxmox_bs or PROXMOX_BS_NO_SECTION)['data_stores'].keys():
         yield Service(
             item=key,
             labels=[ServiceLabel('pbs/datastore', 'yes')],
         )
 
 
-def check_proxmox_bs(item: str, params: Mapping[str, Any], section: Section) -> CheckResult:
-    data_store = section['data_stores'][item]
-
-    running_tasks = []
-    gc_running = False
-    for task in section['task_list']:                                                                   # proxmox-backup-manager task list
-        if "starttime" in task and "endtime" not in task:
-            running_tasks.append(task['upid'])
-            if task.get('worker_id', None) is not None and task['worker_id'].__contains__(item):
-                gc_running = True
-
-    garbage_collection = data_store['proxmox-backup-manager_garbage-collection_status']                 # proxmox-backup-manager garbage-collection status
-    upid = None
-    if garbage_collection.get('upid', None) is not None:
-        upid = garbage_collection['upid']
-    if len(data_store.keys()) != 4:
-        yield Result(
-            state=State.CRIT,
-            summary=f"Authorization failed. Please check to make sure the Given Credentials were correct."
-        )
-        return
-    b_list = data_store['proxmox-backup-client_list']                                                   # proxmox-backup-client list
-    group_count = 0
-    total_backups = 0
-    for e in b_list:
-        group_count += 1
-        total_backups += int(e['backup-count'])
+# Verification state, backup groups and snapshots of a datastore
+def _check_proxmox_bs_snapshots(value_store, data_store) -> CheckResult:
+    summary = data_store.get('proxmox-backup-client_snapshot_summary')                                 # proxmox-backup-client snapshot summary
+    if summary is not None:
+        nr, np, ok, nok = summary['none'], summary['unknown'], summary['ok'], summary['failed']
+        group_count, total_backups = summary.get('groups', 0), summary.get('snapshots', 0)
+    else:
+        snapshot_list, complete = proxmox_bs_snapshots(value_store, 'snapshots', data_store)          # proxmox-backup-client snapshot list/delta
+        if not complete:
+            yield Result(
+                state=State.OK,
+                summary="Snapshot list incomplete until the next full list from the agent",
+            )
+        if not isinstance(snapshot_list, ProxmoxBsSnapshots):
+            snapshot_list = ProxmoxBsSnapshots(snapshot_list)
+        nr = snapshot_list.count(PROXMOX_BS_VERIFY_NONE)
+        ok = snapshot_list.count(PROXMOX_BS_VERIFY_OK)
+        nok = [e for e in snapshot_list.problems if e['verification']['state'] == "failed"]
+        np = [e for e in snapshot_list.problems if e['verification']['state'] != "failed"]
+        group_count, total_backups = snapshot_list.groups, len(snapshot_list)
+    if 'proxmox-backup-client_list' in data_store:                                                     # proxmox-backup-client list
+        # older agents send the group list in the proxmox_bs section, with the snapshot count of every group
+        b_list = data_store['proxmox-backup-client_list']
+        group_count = len(b_list)
+        total_backups = sum(int(e['backup-count']) for e in b_list)
 
     yield Metric(
         name="group_count",
@@ -128,20 +554,6 @@ def check_proxmox_bs(item: str, params: Mapping[str, Any], section: Section) ->
         value=total_backups,
     )
 
-    snapshot_list = data_store['proxmox-backup-client_snapshot_list']                                   # proxmox-backup-client snapshot list
-    nr, np, ok, nok = 0, [], 0, []
-    for e in snapshot_list:
-        if e.get("verification", None) is not None:
-            verify_state = e['verification'].get("state", "na")
-            if verify_state == "ok":
-                ok += 1
-            elif verify_state == "failed":
-                nok.append(e)
-            else:
-                np.append(e)
-        else:
-            nr += 1
-
     yield Metric(
         name="verify_ok",
         value=ok,
@@ -170,27 +582,84 @@ def check_proxmox_bs(item: str, params: Mapping[str, Any], section: Section) ->
 
     for e in np:
         group = f"{e['backup-type']}/{e['backup-id']}"
-        stat = e['verification']['state']
-        upid = e['verification']['upid']
+        stat = e['verification'].get('state')
+        upid = e['verification'].get('upid')
         yield Result(
             state=State.UNKNOWN,
             summary=f"{group} ({upid}) unknown state {stat}"
         )
     for e in nok:
         group = f"{e['backup-type']}/{e['backup-id']}"
-        stat = e['verification']['state']
-        upid = e['verification']['upid']
+        stat = e['verification'].get('state')
+        upid = e['verification'].get('upid')
         yield Result(
             state=State.CRIT,
             summary=f"Verification of {group} ({upid}) {stat}",
         )
 
+
+def check_proxmox_bs(
+    item: str,
+    params: Mapping[str, Any],
+    section_proxmox_bs: Section | None,
+    section_proxmox_bs_tasks: Section | None,
+    section_proxmox_bs_gc: Section | None,
+    section_proxmox_bs_snapshots: Section | None,
+) -> CheckResult:
+    base = section_proxmox_bs or PROXMOX_BS_NO_SECTION
+    if item not in base['data_stores']:
+        return
+    # older agents send tasks, GC task logs and snapshot lists in the base section
+    task_section = section_proxmox_bs_tasks or proxmox_bs_legacy_section(base, 'task_index') or PROXMOX_BS_NO_SECTION
+    gc_section = section_proxmox_bs_gc or base
+    snapshots = section_proxmox_bs_snapshots or proxmox_bs_legacy_section(base, 'clients')
+    # each section once, the base section may stand in for others
+    sections = list({id(section): section for section in (base, task_section, gc_section, snapshots or base)}.values())
+    # the subsections of this datastore from all sections
+    data_store = {
+        **base['data_stores'][item],
+        **gc_section['data_stores'].get(item, {}),
+        **(snapshots or PROXMOX_BS_NO_SECTION)['data_stores'].get(item, {}),
+    }
+    value_store = get_value_store()
+
+    tasks = proxmox_bs_data_store_tasks(value_store, task_section, item)                               # proxmox-backup-manager task list/window
+    gc_running = bool(proxmox_bs_tasks(tasks, 'garbage_collection')['running'])
+
+    for section in sections:
+        # those of no datastore are reported by the agent collection service
+        for name, suffix, error in section['errors']:
+            if suffix == item:
+                yield Result(
+                    state=State.UNKNOWN,
+                    summary=f"Malformed agent output in {name.replace('_', ' ')}",
+                    details=error,
+                )
+
+    garbage_collection = data_store.get('proxmox-backup-manager_garbage-collection_status', {})         # proxmox-backup-manager garbage-collection status
+    gc_upid = None
+    if garbage_collection.get('upid', None) is not None:
+        gc_upid = garbage_collection['upid']
+    if 'proxmox-backup-client_status' not in data_store or snapshots is not None \
+            and not any(k in data_store for k in PROXMOX_BS_SNAPSHOT_SUBSECTIONS):
+        yield Result(
+            state=State.CRIT,
+            summary=f"Authorization failed. Please check to make sure the Given Credentials were correct."
+        )
+        return
+
+    if snapshots is None:
+        # the agent sends the snapshot lists once their first collection,
+        # detached from the agent call, has finished
+        yield Result(state=State.OK, summary="Snapshot lists not collected yet")
+    else:
+        yield from _check_proxmox_bs_snapshots(value_store, data_store)
+
     status = data_store['proxmox-backup-client_status']                                                 # proxmox-backup-client status
 
     try:
         size_mb = float(status['total'])/1024/1024      #status['total'] returning bytes instead of mb
         avail_mb = float(status['avail'])/1024/1024     #status['avail'] returning bytes instead of mb
-        value_store = get_value_store()
 
         yield from df_check_filesystem_single(
             value_store=value_store,
@@ -210,8 +679,8 @@ def check_proxmox_bs(item: str, params: Mapping[str, Any], section: Section) ->
         )
 
     gc_ok = False
-    if section['tasks'].get(upid, None) is not None:                                                    # proxmox-backup-manager task log
-        gc_ok = section['tasks'][upid].get('task_ok', False)
+    if gc_section['tasks'].get(gc_upid, None) is not None:                                              # proxmox-backup-manager task log
+        gc_ok = gc_section['tasks'][gc_upid].get('task_ok', False)
 
     if gc_running:
         yield Result(
@@ -223,7 +692,7 @@ def check_proxmox_bs(item: str, params: Mapping[str, Any], section: Section) ->
             state=State.OK,
             summary=f"GC ok"
         )
-    elif upid is None:
+    elif gc_upid is None:
         yield Result(
             state=State.UNKNOWN,
             summary=f"GC not run yet",
@@ -238,7 +707,7 @@ def check_proxmox_bs(item: str, params: Mapping[str, Any], section: Section) ->
 check_plugin_proxmox_bs = CheckPlugin(
     name="proxmox_bs",
     service_name="PBS Datastore %s",
-    sections=["proxmox_bs"],
+    sections=["proxmox_bs", "proxmox_bs_tasks", "proxmox_bs_gc", "proxmox_bs_snapshots"],
     discovery_function=discover_proxmox_bs,
     check_function=check_proxmox_bs,
     check_default_parameters=FILESYSTEM_DEFAULT_LEVELS,
@@ -246,6 +715,122 @@ check_plugin_proxmox_bs = CheckPlugin(
 )
 
 
+# Jobs: one service per job type and datastore, e.g. "Verify fs01", for the
+# configured jobs and those seen in the task list. Several jobs of a type on a
+# datastore share the service, so overlapping runs show up as running jobs.
+def discover_proxmox_bs_jobs(section_proxmox_bs_tasks: Section | None) -> DiscoveryResult:
+    section = section_proxmox_bs_tasks or PROXMOX_BS_NO_SECTION
+    for name, worker_type, _key in PROXMOX_BS_JOBS:
+        data_stores = set(section['jobs'].get(worker_type, {}))
+        data_stores.update(
+            data_store for data_store, tasks in section['task_index'].items() if worker_type in tasks
+        )
+        for data_store in sorted(data_stores):
+            yield Service(
+                item=f"{name} {data_store}",
+                labels=[ServiceLabel('pbs/job', 'yes')],
+            )
+
+
+def check_proxmox_bs_jobs(
+    item: str,
+    params: Mapping[str, Any],
+    section_proxmox_bs_tasks: Section | None,
+) -> CheckResult:
+    section = section_proxmox_bs_tasks or PROXMOX_BS_NO_SECTION
+    name, _, data_store = item.rpartition(" ")
+    worker_type = {job[0]: job[1] for job in PROXMOX_BS_JOBS}.get(name)
+    if worker_type is None:
+        return
+
+    tasks = proxmox_bs_data_store_tasks(get_value_store(), section, data_store)
+    current = proxmox_bs_tasks(tasks, worker_type)
+    now = time.time()
+
+    running = current['running']
+    yield from check_levels(
+        len(running),
+        levels_upper=params['running_jobs'],
+        metric_name="pbs_job_running",
+        label="Running",
+        render_func=lambda n: str(int(n)),
+    )
+    if running:
+        started = min(task['starttime'] for task in running)
+        yield from check_levels(
+            now - started,
+            levels_upper=params['running_time'],
+            metric_name="pbs_job_running_time",
+            label=f"Running since {render.datetime(started)}",
+            render_func=render.timespan,
+        )
+    # other tasks on the datastore compete for its I/O
+    others = sorted(
+        other for other, other_tasks in tasks.items() if other != worker_type for _task in other_tasks['running']
+    )
+    if others:
+        yield from check_levels(
+            len(others),
+            levels_upper=params['other_tasks'],
+            label=f"Other tasks running on {data_store}",
+            render_func=lambda n: str(int(n)),
+            notice_only=True,
+        )
+        yield Result(state=State.OK, notice=", ".join(others))
+
+    last = current['last']
+    if last is None:
+        yield Result(state=State.OK, summary="No finished run known")
+        if 'task_window' not in section:
+            yield Result(state=State.OK, notice="Finished tasks are only sent with PBS_TASK_MODE=window")
+    else:
+        status = last.get('status', "unknown")
+        yield Result(
+            state=State.OK if status == "OK" else State.WARN if status.startswith("WARNINGS") else State.CRIT,
+            summary=f"Last run {render.datetime(last['endtime'])}: {status}",
+        )
+        yield from check_levels(
+            now - last['endtime'],
+            levels_upper=params['age'],
+            label="Age",
+            render_func=render.timespan,
+        )
+        yield from check_levels(
+            last['endtime'] - last['starttime'],
+            levels_upper=params['duration'],
+            metric_name="pbs_job_duration",
+            label="Duration",
+            render_func=render.timespan,
+        )
+
+    if section.get('task_window', {}).get('truncated'):
+        yield Result(
+            state=State.OK,
+            notice="Task list cut off at PBS_TASK_LIMIT tasks, older tasks follow with the next runs",
+        )
+
+    job_ids = section['jobs'].get(worker_type, {}).get(data_store)
+    if job_ids:
+        yield Result(state=State.OK, notice=f"Jobs: {', '.join(job_ids)}")
+
+
+check_plugin_proxmox_bs_jobs = CheckPlugin(
+    name="proxmox_bs_jobs",
+    service_name="PBS Job %s",
+    sections=["proxmox_bs_tasks"],
+    discovery_function=discover_proxmox_bs_jobs,
+    check_function=check_proxmox_bs_jobs,
+    check_default_parameters={
+        'age': ('no_levels', None),
+        'duration': ('no_levels', None),
+        'running_time': ('fixed', (43200.0, 86400.0)),
+        'running_jobs': ('fixed', (2, 3)),
+        'other_tasks': ('no_levels', None),
+    },
+    check_ruleset_name="proxmox_bs_jobs",
+)
+
+
 
 
 
@@ -289,27 +874,184 @@ def proxmox_bs_gen_clientname(client_json):
         return str(client_json["backup-id"]) + "-" + str(client_json["comment"])
 
 
-# generate Checkmk Service Items
-def proxmox_bs_clients_discovery(section):
-    if 'data_stores' not in section:
+# counters per verification state of a client
+def proxmox_bs_clients_verification():
+    return {
+        "ok": {"newest_date": None, "count": 0},
+        "failed": {"newest_date": None, "count": 0},
+        "notdone": {"newest_date": None, "count": 0},
+    }
+
+
+# add count snapshots, the newest of them taken at newest_date
+def proxmox_bs_clients_count(counter, count, newest_date):
+    counter["count"] += count
+    if newest_date is None:
         return
+    if counter["newest_date"] == None or counter["newest_date"] < newest_date:
+        counter["newest_date"] = newest_date
 
-    clients = []
 
-    #structure results from check output
-    for data_store in section['data_stores']:
-        if 'proxmox-backup-client_snapshot_list' not in section['data_stores'][data_store]:
+# add one snapshot to the verification counters of its client
+def proxmox_bs_clients_add_snapshot(verification, e):
+    #Backup age
+    dt = int(e["backup-time"])
+
+    if "verification" in e:
+        verify_state = e.get("verification", {}).get("state", "na")
+        if verify_state == "ok":
+            proxmox_bs_clients_count(verification["ok"], 1, dt)
+        else:
+            proxmox_bs_clients_count(verification["failed"], 1, dt)
+    else:
+        proxmox_bs_clients_count(verification["notdone"], 1, dt)
+
+
+# counter names of the verification states of ProxmoxBsSnapshots
+PROXMOX_BS_CLIENTS_COUNTERS = {
+    PROXMOX_BS_VERIFY_NONE: "notdone",
+    PROXMOX_BS_VERIFY_OK: "ok",
+    PROXMOX_BS_VERIFY_FAILED: "failed",
+    PROXMOX_BS_VERIFY_UNKNOWN: "failed",
+}
+
+
+# add the snapshots of a ProxmoxBsSnapshots to the verification counters of
+# their clients
+def proxmox_bs_clients_add_snapshots(clients, snapshots):
+    verifications = [
+        clients.setdefault(
+            proxmox_bs_gen_clientname({'backup-id': backup_id, 'comment': comment}),
+            proxmox_bs_clients_verification(),
+        )
+        for backup_id, comment in snapshots.clients
+    ]
+    for client, dt, state in zip(snapshots.client, snapshots.time, snapshots.state):
+        if client >= 0:
+            proxmox_bs_clients_count(verifications[client][PROXMOX_BS_CLIENTS_COUNTERS[state]], 1, dt)
+
+
+# Backup groups of the clients with snapshots in the delta of a datastore, as
+# [backup-id, comment, namespace, backup-type]: those of the base, from the
+# proxmox_bs_client_groups section, with the changes since, or those of the
+# complete list. Older agents send them (or only backup-id and comment as
+# clients) with every delta. None if they are not known.
+def proxmox_bs_delta_groups(delta, base_groups):
+    if 'groups' in delta:
+        return delta['groups']
+    if 'clients' in delta:
+        return [[backup_id, comment, None, None] for backup_id, comment in delta['clients']]
+    if delta['full']:
+        return sorted({
+            (e['backup-id'], e['comment'], e.get('ns') or "", e['backup-type'])
+            for e in delta['added'].values() if 'backup-id' in e and 'comment' in e
+        })
+    if base_groups is None or base_groups.get('base') != delta['base']:
+        return None
+    removed = {tuple(group) for group in delta['groups_removed']}
+    return [group for group in base_groups['groups'] if tuple(group) not in removed] + delta['groups_added']
+
+
+# groups of the base of a datastore in the proxmox_bs_client_groups section
+def proxmox_bs_base_groups(section_proxmox_bs_client_groups, data_store):
+    if section_proxmox_bs_client_groups is None:
+        return None
+    return section_proxmox_bs_client_groups['data_stores'].get(data_store, {}).get('proxmox-backup-client_groups')
+
+
+# Index of all clients (service items) to their verification counters over all
+# datastores, built once in the parse step. Datastores sent as delta only add
+# their clients here, their counters depend on the value store of the service
+# and are added by the check. The clients of deltas that only name the changes
+# of their groups are added with the proxmox_bs_client_groups section, see
+# proxmox_bs_with_client_groups.
+def proxmox_bs_clients_index(parsed, section_proxmox_bs_client_groups=None):
+    clients = {}
+    for name, data_store in parsed['data_stores'].items():
+        delta = data_store.get('proxmox-backup-client_snapshot_delta')
+        if delta is not None:
+            groups = proxmox_bs_delta_groups(delta, proxmox_bs_base_groups(section_proxmox_bs_client_groups, name))
+            for backup_id, comment, _ns, _backup_type in groups or []:
+                cn = proxmox_bs_gen_clientname({'backup-id': backup_id, 'comment': comment})
+                clients.setdefault(cn, proxmox_bs_clients_verification())
             continue
 
-        #collect all clientnames and backup-id's
-        for client_section in section['data_stores'][data_store]['proxmox-backup-client_snapshot_list']:
-            if "comment" in client_section and "backup-id" in client_section:
-                cn = proxmox_bs_gen_clientname(client_section)
+        summary = data_store.get('proxmox-backup-client_snapshot_summary')
+        if summary is not None:
+            #counters already aggregated by the agent
+            for e in summary['clients']:
+                verification = clients.setdefault(proxmox_bs_gen_clientname(e), proxmox_bs_clients_verification())
+                for verify_state in ("ok", "failed", "notdone"):
+                    proxmox_bs_clients_count(verification[verify_state], e[verify_state]["count"], e[verify_state]["newest"])
+            continue
+
+        snapshot_list = data_store.get('proxmox-backup-client_snapshot_list')
+        if snapshot_list is not None:
+            proxmox_bs_clients_add_snapshots(clients, snapshot_list)
+    return clients
+
+
+# backup groups (datastore, namespace, backup-type and backup-id) of every
+# client (service item), to find its backup tasks. Older agents do not send
+# namespace and type of the clients in delta and summary output.
+def proxmox_bs_client_groups(parsed, section_proxmox_bs_client_groups=None):
+    client_groups = {}
+    for name, data_store in parsed['data_stores'].items():
+        if 'proxmox-backup-client_snapshot_delta' in data_store:
+            delta = data_store['proxmox-backup-client_snapshot_delta']
+            groups = [
+                ((backup_id, comment), (ns, backup_type, backup_id))
+                for backup_id, comment, ns, backup_type in proxmox_bs_delta_groups(
+                    delta, proxmox_bs_base_groups(section_proxmox_bs_client_groups, name),
+                ) or []
+                if ns is not None
+            ]
+        elif 'proxmox-backup-client_snapshot_summary' in data_store:
+            groups = [
+                ((e['backup-id'], e['comment']), (ns, backup_type, e['backup-id']))
+                for e in data_store['proxmox-backup-client_snapshot_summary']['clients']
+                for ns, backup_type in e.get('groups', [])
+            ]
+        elif 'proxmox-backup-client_snapshot_list' in data_store:
+            groups = data_store['proxmox-backup-client_snapshot_list'].client_groups()
+        else:
+            continue
+        for (backup_id, comment), group in groups:
+            cn = proxmox_bs_gen_clientname({'backup-id': backup_id, 'comment': comment})
+            client_groups.setdefault(cn, set()).add((name, *group))
+    return client_groups
+
+
+# The snapshots section with the clients of the deltas that only name the
+# changes of their groups, from the groups of their base. Indexed once for the
+# proxmox_bs_client_groups section in use and kept with the section.
+def proxmox_bs_with_client_groups(section, section_proxmox_bs_client_groups):
+    if section_proxmox_bs_client_groups is None or not section.get('data_stores'):
+        return section
+    indexed = section.get('with_client_groups')
+    if indexed is None or indexed[0] is not section_proxmox_bs_client_groups:
+        indexed = section['with_client_groups'] = (section_proxmox_bs_client_groups, {
+            **section,
+            'clients': proxmox_bs_clients_index(section, section_proxmox_bs_client_groups),
+            'client_groups': proxmox_bs_client_groups(section, section_proxmox_bs_client_groups),
+        })
+    return indexed[1]
 
-                if not cn in clients:
-                    clients.append(cn)
 
-    for client_name in clients:
+# generate Checkmk Service Items
+# With PBS_CLIENT_PIGGYBACK=yes the agent sends the verification counters of
+# the clients as piggyback data to their own hosts, in the same section with
+# one snapshot summary per datastore, and lists them in the piggyback
+# subsection of the PBS host, which then skips them.
+# Older agents send the snapshot lists in the proxmox_bs section.
+def proxmox_bs_clients_discovery(section_proxmox_bs_snapshots, section_proxmox_bs_tasks, section_proxmox_bs,
+                                 section_proxmox_bs_client_groups):
+    section = section_proxmox_bs_snapshots or proxmox_bs_legacy_section(section_proxmox_bs, 'clients') or {}
+    section = proxmox_bs_with_client_groups(section, section_proxmox_bs_client_groups)
+    piggyback = set(section.get('piggyback', []))
+    for client_name in section.get('clients', {}):
+        if client_name in piggyback:
+            continue
         yield Service(
             item=client_name,
             #labels=[ServiceLabel('pbs/datastore', 'yes')]
@@ -381,11 +1123,105 @@ def proxmox_bs_clients_discovery(section):
 #    }
 #}
 #]
+#
+# With PBS_SNAPSHOT_FIELDS=slim the agent only sends the fields used below,
+# both formats are parsed the same way:
+#[
+#{
+#    "backup-id":"103",
+#    "backup-time":1742550846,
+#    "backup-type":"vm",
+#    "comment":"pfsense01",
+#    "size":34359739369,
+#    "verification":{
+#        "state":"ok",
+#        "upid":"UPID:pbs:000002C0:000007BA:00000001:67DE4FC4:verificationjob:fs01\\x3av\\x2dee54fa7e\\x2d61f0:root@pam:"
+#    }
+#}
+#]
+
+
+
+# Duration and throughput of the last backup of a client, from the backup
+# tasks of its backup groups in the task list or window. A task window sends a
+# finished task only once, so the last backup is kept in the value store, along
+# with the durations of the last PROXMOX_BS_BACKUP_TREND backups. The
+# throughput is the size of the snapshot taken by the backup over its
+# duration. It needs the snapshot sizes of a snapshot list sent in full
+# (PBS_SNAPSHOT_MODE=list), summary and delta output have none.
+PROXMOX_BS_BACKUP_TREND = 10
+# seconds the backup time of a snapshot may be before the start of its task
+PROXMOX_BS_BACKUP_TIME_SLACK = 300
 
 
+def proxmox_bs_clients_backup(value_store, params, section, tasks, groups):
+    backups = {'running': [], 'last': None}
+    for group in sorted(groups):
+        group_backups = tasks['backups'].get(group)
+        if group_backups is None:
+            continue
+        backups['running'] += group_backups['running']
+        if group_backups['last'] is not None and (
+            backups['last'] is None or backups['last']['endtime'] < group_backups['last']['endtime']
+        ):
+            backups['last'] = group_backups['last']
+
+    last = value_store.get('last_backup')
+    if backups['last'] is not None and (last is None or last['endtime'] < backups['last']['endtime']):
+        last = backups['last']
+        value_store['last_backup'] = last
+        durations = value_store.get('backup_durations', []) + [last['endtime'] - last['starttime']]
+        value_store['backup_durations'] = durations[-PROXMOX_BS_BACKUP_TREND:]
+
+    for task in backups['running']:
+        yield Result(state=State.OK, summary=f"Backup running since {render.datetime(task['starttime'])}")
+    if last is None:
+        return
+
+    duration = last['endtime'] - last['starttime']
+    yield from check_levels(
+        duration,
+        levels_upper=params['backup_duration'],
+        metric_name="pbs_backup_duration",
+        label="Last backup duration",
+        render_func=render.timespan,
+    )
+    status = last.get('status', "unknown")
+    if status != "OK":
+        yield Result(
+            state=State.WARN if status.startswith("WARNINGS") else State.CRIT,
+            summary=f"Last backup {render.datetime(last['endtime'])}: {status}",
+        )
+
+    durations = value_store.get('backup_durations', [])
+    if len(durations) > 1:
+        average = sum(durations) / len(durations)
+        yield Metric(name="pbs_backup_duration_average", value=average)
+        yield Result(
+            state=State.OK,
+            notice=f"Average duration of the last {len(durations)} backups: {render.timespan(average)}",
+        )
+
+    group = _task_backup_group(last)
+    data_store = section['data_stores'].get(group[0], {}) if group else {}
+    snapshot_list = data_store.get('proxmox-backup-client_snapshot_list')
+    if isinstance(snapshot_list, ProxmoxBsSnapshots) and duration > 0:
+        snapshot = snapshot_list.newest(group[1:], last['starttime'] - PROXMOX_BS_BACKUP_TIME_SLACK, last['endtime'])
+        if snapshot is not None and snapshot[1] > 0:
+            yield from check_levels(
+                snapshot[1] / duration,
+                metric_name="pbs_backup_throughput",
+                label="Throughput",
+                render_func=render.iobandwidth,
+            )
+
 
 # Check function
-def proxmox_bs_clients_checks(item, params, section):
+def proxmox_bs_clients_checks(item, params, section_proxmox_bs_snapshots, section_proxmox_bs_tasks, section_proxmox_bs,
+                              section_proxmox_bs_client_groups):
+    section = section_proxmox_bs_snapshots or proxmox_bs_legacy_section(section_proxmox_bs, 'clients') or {}
+    section = proxmox_bs_with_client_groups(section, section_proxmox_bs_client_groups)
+    section_proxmox_bs_tasks = section_proxmox_bs_tasks or proxmox_bs_legacy_section(section_proxmox_bs, 'task_index')
     clients = {}
 
     # Only work with new params
@@ -397,145 +1233,272 @@ def proxmox_bs_clients_checks(item, params, section):
                 ))
             return
 
-    #structure results from check output
+    for name, suffix, error in section.get('errors', []):
+        if name in PROXMOX_BS_SNAPSHOT_SUBSECTIONS:
+            yield Result(state=State.UNKNOWN, summary=(
+                'Malformed agent output in %s of %s' % (name.replace('_', ' '), suffix)
+                ), details=error)
+
+    #counters from the index built in the parse step, copied as delta output may add to them
+    if item in section['clients']:
+        clients[item] = {"verification": {k: dict(v) for k, v in section['clients'][item].items()}}
+
+    value_store = get_value_store()
+
     for data_store in section['data_stores']:
-        if 'proxmox-backup-client_snapshot_list' not in section['data_stores'][data_store]:
+        if not any(k in section['data_stores'][data_store] for k in PROXMOX_BS_SNAPSHOT_SUBSECTIONS):
             yield Result(state=State.UNKNOWN, summary=(
                 'No section proxmox-backup-client_snapshot_list found in agent output'
                 ))
             return
 
-        for e in section['data_stores'][data_store]['proxmox-backup-client_snapshot_list']:
-            #Get clientname
-            cn = proxmox_bs_gen_clientname(e)
+        if 'proxmox-backup-client_snapshot_delta' not in section['data_stores'][data_store]:
+            continue
 
-            #Only process do fruther processing for current item
-            if cn != item:
-                continue
+        #only keep this client's snapshots when rebuilding from delta output, a client
+        #without groups in the base has all of its snapshots in the changes
+        delta = section['data_stores'][data_store]['proxmox-backup-client_snapshot_delta']
+        base_groups = proxmox_bs_base_groups(section_proxmox_bs_client_groups, data_store)
+        snapshot_list, complete = proxmox_bs_snapshots(
+            value_store, 'snapshots.%s' % data_store, section['data_stores'][data_store],
+            accept=lambda e: proxmox_bs_gen_clientname(e) == item,
+            seed=base_groups is not None and base_groups.get('base') == delta.get('base') and not any(
+                proxmox_bs_gen_clientname({'backup-id': backup_id, 'comment': comment}) == item
+                for backup_id, comment, _ns, _backup_type in base_groups['groups']
+            ),
+        )
+        if not complete:
+            yield Result(state=State.OK, summary=(
+                'Snapshot list of %s incomplete until the next full list from the agent' % data_store
+                ))
 
-            if not cn in clients:
-                clients[cn] = {}
+        for e in snapshot_list:
+            verification = clients.setdefault(item, {}).setdefault("verification", proxmox_bs_clients_verification())
+            proxmox_bs_clients_add_snapshot(verification, e)
 
-            #Verification states
-            if not "verification" in clients[cn]:
-                clients[cn]["verification"] = {}
 
-                clients[cn]["verification"]["ok"] = {}
-                clients[cn]["verification"]["ok"]["newest_date"] = None
-                clients[cn]["verification"]["ok"]["count"] = 0
+    #Process client result and yield results (in the clients array should only be the client matching the item)
+    for cn in clients:
+        if cn != item: #useless, because filtering for the right item is done above. But leave it there for safty.
+            continue
 
-                clients[cn]["verification"]["failed"] = {}
-                clients[cn]["verification"]["failed"]["newest_date"] = None
-                clients[cn]["verification"]["failed"]["count"] = 0
+        #OK
+        dpt = ""
+        if clients[cn]["verification"]["ok"]["count"] < params_cmk_24["snapshot_min_ok"]:
+            s=State.WARN
+            dpt= " (minimum of %s backups not reached)" % params_cmk_24["snapshot_min_ok"]
+        elif clients[cn]["verification"]["ok"]["count"] >= params_cmk_24["snapshot_min_ok"]:
+            s=State.OK
+            dpt= ""
 
-                clients[cn]["verification"]["notdone"] = {}
-                clients[cn]["verification"]["notdone"]["newest_date"] = None
-                clients[cn]["verification"]["notdone"]["count"] = 0
+        yield Result(state=s, summary=(
+            'Snapshots verify OK: %d%s' % (clients[cn]["verification"]["ok"]["count"],dpt)
+            ))
 
-            #Backup age
-            dt = int(e["backup-time"])
+        #Age Check OK
+        if clients[cn]["verification"]["ok"]["newest_date"] != None:
+            age = int(time.time() - clients[cn]["verification"]["ok"]["newest_date"])
 
-            if "verification" in e:
-                verify_state = e.get("verification", {}).get("state", "na")
-                if verify_state == "ok":
-                    clients[cn]["verification"]["ok"]["count"] += 1
-                    if clients[cn]["verification"]["ok"]["newest_date"] == None:
-                        clients[cn]["verification"]["ok"]["newest_date"] = dt
-                    elif clients[cn]["verification"]["ok"]["newest_date"] < dt:
-                        clients[cn]["verification"]["ok"]["newest_date"] = dt
+            warn_age, critical_age = params_cmk_24['bkp_age'][1]
 
-                else:
-                    clients[cn]["verification"]["failed"]["count"] += 1
-                    if clients[cn]["verification"]["failed"]["newest_date"] == None:
-                        clients[cn]["verification"]["failed"]["newest_date"] = dt
-                    elif clients[cn]["verification"]["failed"]["newest_date"] < dt:
-                        clients[cn]["verification"]["failed"]["newest_date"] = dt
+            if age >= critical_age:
+                s = State.CRIT
+            elif age >= warn_age:
+                s = State.WARN
             else:
-                    clients[cn]["verification"]["notdone"]["count"] += 1
-                    if clients[cn]["verification"]["notdone"]["newest_date"] == None:
-                        clients[cn]["verification"]["notdone"]["newest_date"] = dt
-                    elif clients[cn]["verification"]["notdone"]["newest_date"] < dt:
-                        clients[cn]["verification"]["notdone"]["newest_date"] = dt
-
-
-        #Process client result and yield results (in the clients array should only be the client matching the item)
-        for cn in clients:
-            if cn != item: #useless, because filtering for the right item is done above. But leave it there for safty.
-                continue
-
-            #OK
-            dpt = ""
-            if clients[cn]["verification"]["ok"]["count"] < params_cmk_24["snapshot_min_ok"]:
-                s=State.WARN
-                dpt= " (minimum of %s backups not reached)" % params_cmk_24["snapshot_min_ok"]
-            elif clients[cn]["verification"]["ok"]["count"] >= params_cmk_24["snapshot_min_ok"]:
-                s=State.OK
-                dpt= ""
+                s = State.OK
 
             yield Result(state=s, summary=(
-                'Snapshots verify OK: %d%s' % (clients[cn]["verification"]["ok"]["count"],dpt)
+                'Timestamp latest verify OK: %s, Age: %s' % (render.datetime(clients[cn]["verification"]["ok"]["newest_date"]), render.timespan(age))
+                ))
+        else:
+            s = State.WARN
+            yield Result(state=s, summary=(
+                'Timestamp latest verify OK: No verified snapshot found'
                 ))
 
-            #Age Check OK
-            if clients[cn]["verification"]["ok"]["newest_date"] != None:
-                age = int(time.time() - clients[cn]["verification"]["ok"]["newest_date"])
-
-                warn_age, critical_age = params_cmk_24['bkp_age'][1]
-
-                if age >= critical_age:
-                    s = State.CRIT
-                elif age >= warn_age:
-                    s = State.WARN
-                else:
-                    s = State.OK
+        #Not verified
+        yield Result(state=State.OK, summary=(
+            'Snapshots verify notdone: %d' % clients[cn]["verification"]["notdone"]["count"]
+            ))
 
-                yield Result(state=s, summary=(
-                    'Timestamp latest verify OK: %s, Age: %s' % (render.datetime(clients[cn]["verification"]["ok"]["newest_date"]), render.timespan(age))
-                    ))
-            else:
-                s = State.WARN
-                yield Result(state=s, summary=(
-                    'Timestamp latest verify OK: No verified snapshot found'
-                    ))
+        if clients[cn]["verification"]["notdone"]["newest_date"] != None:
+            age = int(time.time() - clients[cn]["verification"]["notdone"]["newest_date"])
 
-            #Not verified
             yield Result(state=State.OK, summary=(
-                'Snapshots verify notdone: %d' % clients[cn]["verification"]["notdone"]["count"]
+                'Timestamp latest unverified: %s, Age: %s' % (render.datetime(clients[cn]["verification"]["notdone"]["newest_date"]), render.timespan(age))
+                ))
+        else:
+            s = State.WARN
+            yield Result(state=State.OK, summary=(
+                'Timestamp latest unverified: No unverified snapshot found'
                 ))
 
-            if clients[cn]["verification"]["notdone"]["newest_date"] != None:
-                age = int(time.time() - clients[cn]["verification"]["notdone"]["newest_date"])
-
-                yield Result(state=State.OK, summary=(
-                    'Timestamp latest unverified: %s, Age: %s' % (render.datetime(clients[cn]["verification"]["notdone"]["newest_date"]), render.timespan(age))
-                    ))
-            else:
-                s = State.WARN
-                yield Result(state=State.OK, summary=(
-                    'Timestamp latest unverified: No unverified snapshot found'
-                    ))
 
+        #Failed
+        if clients[cn]["verification"]["failed"]["count"] > 0:
+            s=State.CRIT
+        else:
+            s=State.OK
 
-            #Failed
-            if clients[cn]["verification"]["failed"]["count"] > 0:
-                s=State.CRIT
-            else:
-                s=State.OK
+        yield Result(state=s, summary=(
+            'Snapshots verify failed: %d' % clients[cn]["verification"]["failed"]["count"]
+            ))
 
-            yield Result(state=s, summary=(
-                'Snapshots verify failed: %d' % clients[cn]["verification"]["failed"]["count"]
-                ))
+    #Backup duration and throughput from the backup tasks
+    if section_proxmox_bs_tasks is not None and item in section.get('client_groups', {}):
+        yield from proxmox_bs_clients_backup(
+            value_store, params_cmk_24, section, section_proxmox_bs_tasks, section['client_groups'][item],
+        )
 
 
 check_plugin_proxmox_bs_clients = CheckPlugin(
     name="proxmox_bs_clients",
     service_name="PBS Client %s",
-    sections=["proxmox_bs"],
+    sections=["proxmox_bs_snapshots", "proxmox_bs_tasks", "proxmox_bs", "proxmox_bs_client_groups"],
     discovery_function=proxmox_bs_clients_discovery,
     check_function=proxmox_bs_clients_checks,
     check_default_parameters={
                                 'bkp_age': ('fixed', (172800, 259200)),
-                                'snapshot_min_ok': 1
+                                'snapshot_min_ok': 1,
+                                'backup_duration': ('no_levels', None),
                             },
     check_ruleset_name="proxmox_bs_clients",
-)
\ No newline at end of file
+)
+
+
+
+# Agent collection: run time of the agent plugin, from its timing subsection
+# {"collector": "cli", "duration": 2.7, "interval": 3600,
+#  "units": [{"name": "snapshots", "cached": true, "age": 120, "duration": 0.002}, ...],
+#  "commands": [{"command": "proxmox-backup-client snapshot list", "target": "fs01/ns1",
+#                "duration": 0.4, "rc": 0, "bytes": 12345}, ...]}
+# and the malformed agent output of no datastore, e.g. of the task list.
+def discover_proxmox_bs_collection(
+    section_proxmox_bs_timing: Section | None,
+    section_proxmox_bs: Section | None,
+    section_proxmox_bs_tasks: Section | None,
+    section_proxmox_bs_gc: Section | None,
+    section_proxmox_bs_snapshots: Section | None,
+) -> DiscoveryResult:
+    if section_proxmox_bs_timing is not None and 'timing' in section_proxmox_bs_timing:
+        yield Service()
+
+
+# exit code of timeout(1) when the command ran longer than PBS_TIMEOUT
+PROXMOX_BS_TIMED_OUT = 124
+
+
+def _collection_command(command):
+    return f"{command['command']} {command['target']}".rstrip()
+
+
+def check_proxmox_bs_collection(
+    params: Mapping[str, Any],
+    section_proxmox_bs_timing: Section | None,
+    section_proxmox_bs: Section | None,
+    section_proxmox_bs_tasks: Section | None,
+    section_proxmox_bs_gc: Section | None,
+    section_proxmox_bs_snapshots: Section | None,
+) -> CheckResult:
+    timing = (section_proxmox_bs_timing or PROXMOX_BS_NO_SECTION).get('timing')
+    if timing is None:
+        return
+    data_stores = (section_proxmox_bs or PROXMOX_BS_NO_SECTION)['data_stores']
+
+    for section in (section_proxmox_bs, section_proxmox_bs_tasks, section_proxmox_bs_gc, section_proxmox_bs_snapshots):
+        for name, suffix, error in (section or PROXMOX_BS_NO_SECTION)['errors']:
+            if suffix not in data_stores:
+                yield Result(
+                    state=State.UNKNOWN,
+                    summary=f"Malformed agent output in {name.replace('_', ' ')}",
+                    details=f"{suffix}: {error}" if suffix else error,
+                )
+    duration = timing['duration']
+    # a plugin without interval runs on every agent call, i.e. every check interval
+    interval = timing.get('interval') or params['check_interval']
+
+    yield from check_levels(
+        duration,
+        metric_name="pbs_collection_duration",
+        label="Collection time",
+        render_func=render.timespan,
+    )
+    yield from check_levels(
+        duration * 100.0 / interval,
+        levels_upper=params['interval_usage'],
+        metric_name="pbs_collection_interval_usage",
+        label=f"Share of {render.timespan(interval)} interval",
+        render_func=render.percent,
+    )
+
+    for unit in timing.get('units', []):
+        if unit['cached']:
+            yield Result(
+                state=State.OK,
+                notice=f"{unit['name'].capitalize()}: from cache, {render.timespan(unit['age'])} old",
+            )
+        else:
+            yield Result(
+                state=State.OK,
+                notice=f"{unit['name'].capitalize()}: collected in {render.timespan(unit['duration'])}",
+            )
+
+    commands = timing.get('commands', [])
+    # time spent on each datastore, its namespaces included. Commands run in
+    # parallel, so this is work time rather than elapsed time.
+    per_data_store = {}
+    for command in commands:
+        data_store = command['target'].split("/", 1)[0]
+        if data_store in data_stores:
+            per_data_store[data_store] = per_data_store.get(data_store, 0.0) + command['duration']
+    if per_data_store:
+        slowest = max(per_data_store, key=per_data_store.get)
+        yield from check_levels(
+            per_data_store[slowest],
+            levels_upper=params['data_store_duration'],
+            metric_name="pbs_collection_slowest_data_store",
+            label=f"Slowest datastore {slowest}",
+            render_func=render.timespan,
+        )
+
+    yield Metric(name="pbs_collection_commands", value=len(commands))
+    yield Metric(name="pbs_collection_output_size", value=sum(c['bytes'] for c in commands))
+
+    failed = [c for c in commands if c['rc'] != 0]
+    if failed:
+        yield Result(
+            state=State.WARN,
+            summary=f"{len(failed)} of {len(commands)} commands failed",
+            details="\n".join(
+                f"{_collection_command(c)}: "
+                + ("timed out" if c['rc'] == PROXMOX_BS_TIMED_OUT else f"exit code {c['rc']}")
+                for c in failed
+            ),
+        )
+    else:
+        yield Result(state=State.OK, notice=f"{len(commands)} commands run")
+
+    slow = sorted(commands, key=lambda c: c['duration'], reverse=True)[:5]
+    if slow:
+        yield Result(
+            state=State.OK,
+            notice="Slowest commands: " + ", ".join(
+                f"{_collection_command(c)} {render.timespan(c['duration'])}" for c in slow
+            ),
+        )
+
+
+check_plugin_proxmox_bs_collection = CheckPlugin(
+    name="proxmox_bs_collection",
+    service_name="PBS Agent Collection",
+    sections=["proxmox_bs_timing", "proxmox_bs", "proxmox_bs_tasks", "proxmox_bs_gc", "proxmox_bs_snapshots"],
+    discovery_function=discover_proxmox_bs_collection,
+    check_function=check_proxmox_bs_collection,
+    check_default_parameters={
+        'interval_usage': ('fixed', (50.0, 80.0)),
+        'data_store_duration': ('no_levels', None),
+        'check_interval': 60.0,
+    },
+    check_ruleset_name="proxmox_bs_collection",
+)
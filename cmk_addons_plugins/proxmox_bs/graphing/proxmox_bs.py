@@ -11,8 +11,11 @@ from cmk.graphing.v1.metrics import (
     Metric,
     Unit,
     DecimalNotation,
+    IECNotation,
+    TimeNotation,
     Color,
 )
+from cmk.graphing.v1.perfometers import Closed, FocusRange, Perfometer
 
 
 metric_group_count = Metric(
@@ -80,3 +83,138 @@ graph_pbs_info = Graph(
         "verify_none",
     ],
 )
+
+
+metric_pbs_backup_duration = Metric(
+    name="pbs_backup_duration",
+    title=Title("Duration of the last backup"),
+    unit=Unit(TimeNotation()),
+    color=Color.BLUE,
+)
+
+
+metric_pbs_backup_duration_average = Metric(
+    name="pbs_backup_duration_average",
+    title=Title("Average duration of the last backups"),
+    unit=Unit(TimeNotation()),
+    color=Color.LIGHT_BLUE,
+)
+
+
+metric_pbs_backup_throughput = Metric(
+    name="pbs_backup_throughput",
+    title=Title("Backup throughput"),
+    unit=Unit(IECNotation("B/s")),
+    color=Color.GREEN,
+)
+
+
+graph_pbs_backup_duration = Graph(
+    name="pbs_backup_duration",
+    title=Title("Backup duration"),
+    simple_lines=[
+        "pbs_backup_duration",
+        "pbs_backup_duration_average",
+    ],
+    optional=[
+        "pbs_backup_duration_average",
+    ],
+)
+
+
+metric_pbs_job_running = Metric(
+    name="pbs_job_running",
+    title=Title("Running jobs"),
+    unit=Unit(DecimalNotation("count")),
+    color=Color.LIGHT_PURPLE,
+)
+
+
+metric_pbs_job_running_time = Metric(
+    name="pbs_job_running_time",
+    title=Title("Run time of the running job"),
+    unit=Unit(TimeNotation()),
+    color=Color.ORANGE,
+)
+
+
+metric_pbs_job_duration = Metric(
+    name="pbs_job_duration",
+    title=Title("Duration of the last job run"),
+    unit=Unit(TimeNotation()),
+    color=Color.BLUE,
+)
+
+
+graph_pbs_job_duration = Graph(
+    name="pbs_job_duration",
+    title=Title("Job duration"),
+    simple_lines=[
+        "pbs_job_duration",
+        "pbs_job_running_time",
+    ],
+    optional=[
+        "pbs_job_duration",
+        "pbs_job_running_time",
+    ],
+)
+
+
+metric_pbs_collection_duration = Metric(
+    name="pbs_collection_duration",
+    title=Title("Collection time"),
+    unit=Unit(TimeNotation()),
+    color=Color.BLUE,
+)
+
+
+metric_pbs_collection_slowest_data_store = Metric(
+    name="pbs_collection_slowest_data_store",
+    title=Title("Time spent on the slowest datastore"),
+    unit=Unit(TimeNotation()),
+    color=Color.LIGHT_BLUE,
+)
+
+
+metric_pbs_collection_interval_usage = Metric(
+    name="pbs_collection_interval_usage",
+    title=Title("Collection time relative to the plugin interval"),
+    unit=Unit(DecimalNotation("%")),
+    color=Color.ORANGE,
+)
+
+
+metric_pbs_collection_commands = Metric(
+    name="pbs_collection_commands",
+    title=Title("Commands and API requests"),
+    unit=Unit(DecimalNotation("count")),
+    color=Color.LIGHT_PURPLE,
+)
+
+
+metric_pbs_collection_output_size = Metric(
+    name="pbs_collection_output_size",
+    title=Title("Collected data"),
+    unit=Unit(IECNotation("B")),
+    color=Color.LIGHT_GREEN,
+)
+
+
+graph_pbs_collection_time = Graph(
+    name="pbs_collection_time",
+    title=Title("Agent collection time"),
+    simple_lines=[
+        "pbs_collection_duration",
+        "pbs_collection_slowest_data_store",
+    ],
+    optional=[
+        "pbs_collection_slowest_data_store",
+    ],
+)
+
+
+perfometer_pbs_collection_interval_usage = Perfometer(
+    name="pbs_collection_interval_usage",
+    focus_range=FocusRange(Closed(0), Closed(100)),
+    segments=["pbs_collection_interval_usage"],
+)
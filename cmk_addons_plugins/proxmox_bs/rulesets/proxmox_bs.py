@@ -2,10 +2,21 @@
 
 from cmk.rulesets.v1 import Help, Title, Label
 from cmk.rulesets.v1.form_specs import (
+    BooleanChoice,
+    DefaultValue,
     DictElement,
     Dictionary,
+    Integer,
+    List,
+    MatchingScope,
+    RegularExpression,
+    SingleChoice,
+    SingleChoiceElement,
     String,
     Password,
+    TimeMagnitude,
+    TimeSpan,
+    validators,
 )
 from cmk.rulesets.v1.rule_specs import Topic, AgentConfig
 
@@ -41,6 +52,190 @@ def _parameter_form_proxmox_bs() -> Dictionary:
                 ),
                 required=True,
             ),
+            'interval': DictElement(
+                parameter_form=TimeSpan(
+                    title=Title("Run the plugin every"),
+                    help_text=Help(
+                        "Defaults to one hour. With 0 the plugin runs on every agent call. Usage and GC "
+                        "state are then current, while the snapshot lists are only walked as often as "
+                        "set below. Asynchronous execution needs an interval."
+                    ),
+                    displayed_magnitudes=[TimeMagnitude.HOUR, TimeMagnitude.MINUTE],
+                    prefill=DefaultValue(3600.0),
+                ),
+            ),
+            'asynchronous': DictElement(
+                parameter_form=BooleanChoice(
+                    title=Title("Asynchronous execution"),
+                    label=Label("Run the plugin in the background"),
+                ),
+            ),
+            'parallel': DictElement(
+                parameter_form=Integer(
+                    title=Title("Concurrent collection jobs"),
+                    help_text=Help(
+                        "Datastores, namespaces and task logs collected at once, or concurrent API "
+                        "requests. 1 collects everything sequentially."
+                    ),
+                    prefill=DefaultValue(4),
+                    custom_validate=(validators.NumberInRange(min_value=1),),
+                ),
+            ),
+            'timeout': DictElement(
+                parameter_form=TimeSpan(
+                    title=Title("Timeout of each PBS command or API request"),
+                    displayed_magnitudes=[TimeMagnitude.MINUTE, TimeMagnitude.SECOND],
+                    prefill=DefaultValue(60.0),
+                ),
+            ),
+            'cache_snapshots': DictElement(
+                parameter_form=TimeSpan(
+                    title=Title("Walk the snapshot lists every"),
+                    help_text=Help(
+                        "The snapshot lists of all datastores and namespaces are walked again once "
+                        "their last walk is this old, in the background, while the agent keeps sending "
+                        "the last lists. Without this option they are walked every hour. 0 walks them "
+                        "on every run of the plugin."
+                    ),
+                    displayed_magnitudes=[TimeMagnitude.HOUR, TimeMagnitude.MINUTE],
+                    prefill=DefaultValue(3600.0),
+                ),
+            ),
+            'cache_state': DictElement(
+                parameter_form=TimeSpan(
+                    title=Title("Collect usage, tasks, jobs and GC state every"),
+                    help_text=Help(
+                        "Like the snapshot lists. Without this option they are collected on every run "
+                        "of the plugin."
+                    ),
+                    displayed_magnitudes=[TimeMagnitude.HOUR, TimeMagnitude.MINUTE],
+                    prefill=DefaultValue(300.0),
+                ),
+            ),
+            'task_mode': DictElement(
+                parameter_form=SingleChoice(
+                    title=Title("Tasks"),
+                    help_text=Help(
+                        "The job services and the backup duration of the clients need the finished "
+                        "tasks. Without this option the tasks started since the last run are sent "
+                        "along with the running ones."
+                    ),
+                    elements=[
+                        SingleChoiceElement(
+                            name="window",
+                            title=Title("Tasks started since the last run and running tasks"),
+                        ),
+                        SingleChoiceElement(
+                            name="running",
+                            title=Title("Only the running tasks"),
+                        ),
+                    ],
+                    prefill=DefaultValue("window"),
+                ),
+            ),
+            'task_window': DictElement(
+                parameter_form=TimeSpan(
+                    title=Title("Period of the tasks sent by the first run"),
+                    help_text=Help(
+                        "With the tasks started since the last run, the first run of the plugin sends "
+                        "the tasks started within this period."
+                    ),
+                    displayed_magnitudes=[TimeMagnitude.DAY, TimeMagnitude.HOUR],
+                    prefill=DefaultValue(86400.0),
+                ),
+            ),
+            'task_types': DictElement(
+                parameter_form=List(
+                    title=Title("Only send tasks of the worker types"),
+                    help_text=Help(
+                        "With the tasks started since the last run, only tasks of these worker types are "
+                        "sent, e.g. <tt>garbage_collection</tt>, <tt>verificationjob</tt>, <tt>syncjob</tt>, "
+                        "<tt>prunejob</tt>, <tt>tape-backup-job</tt> or <tt>backup</tt>."
+                    ),
+                    element_template=String(
+                        title=Title("Worker type"),
+                        custom_validate=(validators.LengthInRange(min_value=1),),
+                    ),
+                ),
+            ),
+            'datastore_include': DictElement(
+                parameter_form=RegularExpression(
+                    title=Title("Only collect datastores matching"),
+                    predefined_help_text=MatchingScope.FULL,
+                ),
+            ),
+            'datastore_exclude': DictElement(
+                parameter_form=RegularExpression(
+                    title=Title("Do not collect datastores matching"),
+                    predefined_help_text=MatchingScope.FULL,
+                ),
+            ),
+            'namespace_include': DictElement(
+                parameter_form=RegularExpression(
+                    title=Title("Only collect namespaces matching"),
+                    help_text=Help("The datastore root is always collected."),
+                    predefined_help_text=MatchingScope.FULL,
+                ),
+            ),
+            'namespace_exclude': DictElement(
+                parameter_form=RegularExpression(
+                    title=Title("Do not collect namespaces matching"),
+                    predefined_help_text=MatchingScope.FULL,
+                ),
+            ),
+            'snapshot_fields': DictElement(
+                parameter_form=SingleChoice(
+                    title=Title("Snapshot details"),
+                    elements=[
+                        SingleChoiceElement(
+                            name="full",
+                            title=Title("Complete snapshots including their file lists"),
+                        ),
+                        SingleChoiceElement(
+                            name="slim",
+                            title=Title("Only the fields the checks use"),
+                        ),
+                    ],
+                    prefill=DefaultValue("full"),
+                ),
+            ),
+            'client_piggyback': DictElement(
+                parameter_form=Dictionary(
+                    title=Title("Client services on the hosts of the backed up guests"),
+                    help_text=Help(
+                        "Sends the verification counters of every backup client as piggyback data to the "
+                        "host named by the first word of its snapshot comment, instead of creating all "
+                        "\"PBS Client\" services on the Proxmox Backup Server host."
+                    ),
+                    elements={
+                        'host_map': DictElement(
+                            parameter_form=List(
+                                title=Title("Host names of clients"),
+                                help_text=Help(
+                                    "Overrides the host name derived from the snapshot comment. A host "
+                                    "name of \"-\" keeps the client on the Proxmox Backup Server host."
+                                ),
+                                element_template=Dictionary(
+                                    elements={
+                                        'client': DictElement(
+                                            parameter_form=String(
+                                                title=Title("Backup ID or first word of the comment"),
+                                            ),
+                                            required=True,
+                                        ),
+                                        'host': DictElement(
+                                            parameter_form=String(
+                                                title=Title("Host name"),
+                                            ),
+                                            required=True,
+                                        ),
+                                    },
+                                ),
+                            ),
+                        ),
+                    },
+                ),
+            ),
         }
     )
 
@@ -4,6 +4,7 @@
 # License: GPLv2
 
 from cmk.rulesets.v1 import (
+    Help,
     Title,
 )
 from cmk.rulesets.v1.form_specs import (
@@ -29,6 +30,7 @@ def _parameter_proxmox_bs_clients():
         migrate=lambda model: { #force defaults for with model.get(...,DEFAULT)
             'bkp_age': migrate_to_upper_float_levels(model.get('backup_age',('fixed',(1.5 * 86400.0, 2 * 86400.0)))),
             'snapshot_min_ok': model.get('snapshot_min_ok',1),
+            'backup_duration': model.get('backup_duration',('no_levels',None)),
         },        
         elements={
             'bkp_age': DictElement(
@@ -54,6 +56,23 @@ def _parameter_proxmox_bs_clients():
                     prefill=DefaultValue(1)
                 )
             ),
+            'backup_duration': DictElement(
+                required=True,
+                parameter_form=SimpleLevels(
+                    title = Title('Duration of the last backup'),
+                    help_text = Help(
+                        'Needs the finished backup tasks, i.e. PBS_TASK_MODE=window in the agent plugin, '
+                        'which the agent bakery sets unless the agent rule selects only the running tasks.'
+                    ),
+                    level_direction = LevelDirection.UPPER,
+                    form_spec_template = TimeSpan(
+                        displayed_magnitudes=[TimeMagnitude.HOUR, TimeMagnitude.MINUTE],
+                    ),
+                    prefill_fixed_levels = InputHint(
+                        value=(2 * 3600.0, 4 * 3600.0),
+                    )
+                )
+            ),
         }
     )
 
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+# Copyright (c) 2021 inett GmbH
+# License: GNU General Public License v2
+# A file is subject to the terms and conditions defined in the file LICENSE,
+# which is part of this source code package.
+
+from cmk.rulesets.v1 import Help, Title
+from cmk.rulesets.v1.form_specs import (
+    DefaultValue,
+    DictElement,
+    Dictionary,
+    InputHint,
+    LevelDirection,
+    Percentage,
+    SimpleLevels,
+    TimeMagnitude,
+    TimeSpan,
+)
+from cmk.rulesets.v1.rule_specs import CheckParameters, HostCondition, Topic
+
+
+def _parameter_form_proxmox_bs_collection() -> Dictionary:
+    return Dictionary(
+        elements={
+            'interval_usage': DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Collection time relative to the plugin interval"),
+                    help_text=Help(
+                        "Runs of the agent plugin start to overlap once the collection takes longer "
+                        "than the interval of the plugin."
+                    ),
+                    level_direction=LevelDirection.UPPER,
+                    form_spec_template=Percentage(),
+                    prefill_fixed_levels=DefaultValue((50.0, 80.0)),
+                ),
+                required=True,
+            ),
+            'data_store_duration': DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Time spent on the slowest datastore"),
+                    help_text=Help(
+                        "Sum of the run times of all commands or API requests for one datastore and its "
+                        "namespaces."
+                    ),
+                    level_direction=LevelDirection.UPPER,
+                    form_spec_template=TimeSpan(
+                        displayed_magnitudes=[TimeMagnitude.MINUTE, TimeMagnitude.SECOND],
+                    ),
+                    prefill_fixed_levels=InputHint((600.0, 1200.0)),
+                ),
+                required=True,
+            ),
+            'check_interval': DictElement(
+                parameter_form=TimeSpan(
+                    title=Title("Interval of a plugin running on every agent call"),
+                    help_text=Help(
+                        "With interval 0 in the agent rule, the plugin runs on every agent call, "
+                        "i.e. at the check interval of the host."
+                    ),
+                    displayed_magnitudes=[TimeMagnitude.MINUTE, TimeMagnitude.SECOND],
+                    prefill=DefaultValue(60.0),
+                ),
+                required=True,
+            ),
+        }
+    )
+
+
+rule_spec_proxmox_bs_collection = CheckParameters(
+    name="proxmox_bs_collection",
+    topic=Topic.STORAGE,
+    parameter_form=_parameter_form_proxmox_bs_collection,
+    title=Title("Proxmox Backup Server (PBS) Agent Collection"),
+    condition=HostCondition(),
+)
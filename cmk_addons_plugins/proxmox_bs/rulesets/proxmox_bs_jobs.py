@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+# Copyright (c) 2021 inett GmbH
+# License: GNU General Public License v2
+# A file is subject to the terms and conditions defined in the file LICENSE,
+# which is part of this source code package.
+
+from cmk.rulesets.v1 import Help, Title
+from cmk.rulesets.v1.form_specs import (
+    DefaultValue,
+    DictElement,
+    Dictionary,
+    InputHint,
+    Integer,
+    LevelDirection,
+    SimpleLevels,
+    TimeMagnitude,
+    TimeSpan,
+)
+from cmk.rulesets.v1.rule_specs import CheckParameters, HostAndItemCondition, Topic
+
+
+def _parameter_form_proxmox_bs_jobs() -> Dictionary:
+    return Dictionary(
+        elements={
+            'age': DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Time since the last run finished"),
+                    help_text=Help(
+                        "Finished runs are only known with <tt>PBS_TASK_MODE=window</tt> in the agent "
+                        "plugin configuration, which the agent bakery sets unless the agent rule selects "
+                        "only the running tasks."
+                    ),
+                    level_direction=LevelDirection.UPPER,
+                    form_spec_template=TimeSpan(
+                        displayed_magnitudes=[TimeMagnitude.DAY, TimeMagnitude.HOUR],
+                    ),
+                    prefill_fixed_levels=InputHint((172800.0, 259200.0)),
+                ),
+                required=True,
+            ),
+            'duration': DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Duration of the last run"),
+                    level_direction=LevelDirection.UPPER,
+                    form_spec_template=TimeSpan(
+                        displayed_magnitudes=[TimeMagnitude.HOUR, TimeMagnitude.MINUTE],
+                    ),
+                    prefill_fixed_levels=InputHint((14400.0, 28800.0)),
+                ),
+                required=True,
+            ),
+            'running_time': DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Run time of a running job"),
+                    level_direction=LevelDirection.UPPER,
+                    form_spec_template=TimeSpan(
+                        displayed_magnitudes=[TimeMagnitude.HOUR, TimeMagnitude.MINUTE],
+                    ),
+                    prefill_fixed_levels=DefaultValue((43200.0, 86400.0)),
+                ),
+                required=True,
+            ),
+            'running_jobs': DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Jobs of this type running at once on the datastore"),
+                    level_direction=LevelDirection.UPPER,
+                    form_spec_template=Integer(),
+                    prefill_fixed_levels=DefaultValue((2, 3)),
+                ),
+                required=True,
+            ),
+            'other_tasks': DictElement(
+                parameter_form=SimpleLevels(
+                    title=Title("Other tasks running on the datastore at the same time"),
+                    help_text=Help(
+                        "Tasks of any other type, e.g. backups, garbage collection or other jobs, "
+                        "which compete for the I/O of the datastore."
+                    ),
+                    level_direction=LevelDirection.UPPER,
+                    form_spec_template=Integer(),
+                    prefill_fixed_levels=InputHint((2, 4)),
+                ),
+                required=True,
+            ),
+        }
+    )
+
+
+rule_spec_proxmox_bs_jobs = CheckParameters(
+    name="proxmox_bs_jobs",
+    topic=Topic.STORAGE,
+    parameter_form=_parameter_form_proxmox_bs_jobs,
+    title=Title("Proxmox Backup Server (PBS) Jobs"),
+    condition=HostAndItemCondition(item_title=Title("Job type and datastore")),
+)
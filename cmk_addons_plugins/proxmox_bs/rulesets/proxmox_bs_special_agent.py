@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+# Copyright (c) 2021 inett GmbH
+# License: GNU General Public License v2
+# A file is subject to the terms and conditions defined in the file LICENSE,
+# which is part of this source code package.
+
+from cmk.rulesets.v1 import Help, Label, Title
+from cmk.rulesets.v1.form_specs import (
+    BooleanChoice,
+    DefaultValue,
+    DictElement,
+    Dictionary,
+    Integer,
+    List,
+    MatchingScope,
+    Password,
+    RegularExpression,
+    SingleChoice,
+    SingleChoiceElement,
+    String,
+    TimeMagnitude,
+    TimeSpan,
+    validators,
+)
+from cmk.rulesets.v1.rule_specs import SpecialAgent, Topic
+
+
+def _parameter_form_proxmox_bs_special_agent() -> Dictionary:
+    return Dictionary(
+        elements={
+            'username': DictElement(
+                parameter_form=String(
+                    title=Title("Username"),
+                    help_text=Help("<tt>user@realm</tt>, or <tt>user@realm!token</tt> for an API token."),
+                ),
+                required=True,
+            ),
+            'password': DictElement(
+                parameter_form=Password(
+                    title=Title("Password or API token secret"),
+                ),
+                required=True,
+            ),
+            'port': DictElement(
+                parameter_form=Integer(
+                    title=Title("Port"),
+                    prefill=DefaultValue(8007),
+                    custom_validate=(validators.NetworkPort(),),
+                ),
+                required=True,
+            ),
+            'fingerprint': DictElement(
+                parameter_form=String(
+                    title=Title("Fingerprint"),
+                    help_text=Help(
+                        "SHA256 fingerprint of the certificate of the PBS. Without it, the certificate "
+                        "is verified for the host name."
+                    ),
+                ),
+            ),
+            'no_cert_check': DictElement(
+                parameter_form=BooleanChoice(
+                    title=Title("SSL certificate verification"),
+                    label=Label("Do not verify the certificates"),
+                ),
+            ),
+            'timeout': DictElement(
+                parameter_form=TimeSpan(
+                    title=Title("Timeout of each API request"),
+                    displayed_magnitudes=[TimeMagnitude.MINUTE, TimeMagnitude.SECOND],
+                    prefill=DefaultValue(60.0),
+                ),
+                required=True,
+            ),
+            'host_timeout': DictElement(
+                parameter_form=TimeSpan(
+                    title=Title("Timeout of polling one PBS"),
+                    help_text=Help(
+                        "A PBS not polled completely within this time is reported as failed, "
+                        "without delaying the other PBS nodes."
+                    ),
+                    displayed_magnitudes=[TimeMagnitude.MINUTE, TimeMagnitude.SECOND],
+                    prefill=DefaultValue(300.0),
+                ),
+                required=True,
+            ),
+            'parallel': DictElement(
+                parameter_form=Integer(
+                    title=Title("Concurrent API requests per PBS"),
+                    help_text=Help("Each runs over its own keep-alive connection."),
+                    prefill=DefaultValue(4),
+                    custom_validate=(validators.NumberInRange(min_value=1),),
+                ),
+                required=True,
+            ),
+            'task_window': DictElement(
+                parameter_form=TimeSpan(
+                    title=Title("Send the tasks started within"),
+                    help_text=Help(
+                        "Besides the running tasks, the finished tasks since the last run are sent, which the "
+                        "job and backup duration checks need, at most this period back. 0 sends the running "
+                        "tasks only."
+                    ),
+                    displayed_magnitudes=[TimeMagnitude.DAY, TimeMagnitude.HOUR],
+                    prefill=DefaultValue(86400.0),
+                ),
+                required=True,
+            ),
+            'datastore_include': DictElement(
+                parameter_form=RegularExpression(
+                    title=Title("Only collect datastores matching"),
+                    predefined_help_text=MatchingScope.FULL,
+                ),
+            ),
+            'datastore_exclude': DictElement(
+                parameter_form=RegularExpression(
+                    title=Title("Do not collect datastores matching"),
+                    predefined_help_text=MatchingScope.FULL,
+                ),
+            ),
+            'namespace_include': DictElement(
+                parameter_form=RegularExpression(
+                    title=Title("Only collect namespaces matching"),
+                    help_text=Help("The datastore root is always collected."),
+                    predefined_help_text=MatchingScope.FULL,
+                ),
+            ),
+            'namespace_exclude': DictElement(
+                parameter_form=RegularExpression(
+                    title=Title("Do not collect namespaces matching"),
+                    predefined_help_text=MatchingScope.FULL,
+                ),
+            ),
+            'snapshot_fields': DictElement(
+                parameter_form=SingleChoice(
+                    title=Title("Snapshot details"),
+                    elements=[
+                        SingleChoiceElement(
+                            name="full",
+                            title=Title("Complete snapshots including their file lists"),
+                        ),
+                        SingleChoiceElement(
+                            name="slim",
+                            title=Title("Only the fields the checks use"),
+                        ),
+                    ],
+                    prefill=DefaultValue("full"),
+                ),
+            ),
+            'nodes': DictElement(
+                parameter_form=List(
+                    title=Title("Further PBS nodes"),
+                    help_text=Help(
+                        "Polled at the same time as this host, with the same credentials, and sent as "
+                        "piggyback data for the given host names."
+                    ),
+                    element_template=Dictionary(
+                        elements={
+                            'host': DictElement(
+                                parameter_form=String(
+                                    title=Title("Host name"),
+                                ),
+                                required=True,
+                            ),
+                            'address': DictElement(
+                                parameter_form=String(
+                                    title=Title("Address, if not the host name"),
+                                ),
+                            ),
+                            'fingerprint': DictElement(
+                                parameter_form=String(
+                                    title=Title("Fingerprint"),
+                                ),
+                            ),
+                        },
+                    ),
+                ),
+            ),
+        }
+    )
+
+
+rule_spec_proxmox_bs_special_agent = SpecialAgent(
+    name="proxmox_bs",
+    title=Title("Proxmox Backup Server (PBS) via REST API"),
+    topic=Topic.STORAGE,
+    parameter_form=_parameter_form_proxmox_bs_special_agent,
+    help_text=Help(
+        "Polls the REST API of Proxmox Backup Servers from the monitoring server, instead of the "
+        "agent plugin on every PBS (<tt>agent_proxmox_bs</tt>)."
+    ),
+)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+# Copyright (c) 2021 inett GmbH
+# License: GNU General Public License v2
+# A file is subject to the terms and conditions defined in the file LICENSE,
+# which is part of this source code package.
+
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+from cmk.server_side_calls.v1 import (
+    HostConfig,
+    SpecialAgentCommand,
+    SpecialAgentConfig,
+    noop_parser,
+)
+
+
+def _commands_proxmox_bs(params: Mapping[str, Any], host_config: HostConfig) -> Iterator[SpecialAgentCommand]:
+    args: list = [
+        "--user", params['username'],
+        "--password", params['password'],
+        "--port", str(params['port']),
+        "--timeout", str(int(params['timeout'])),
+        "--host-timeout", str(int(params['host_timeout'])),
+        "--parallel", str(params['parallel']),
+        "--task-window", str(int(params['task_window'])),
+        "--server-name", host_config.name,
+    ]
+    if params.get('fingerprint'):
+        args += ["--fingerprint", params['fingerprint']]
+    if params.get('no_cert_check'):
+        args.append("--no-cert-check")
+    for key, option in (
+        ('datastore_include', "--datastore-include"),
+        ('datastore_exclude', "--datastore-exclude"),
+        ('namespace_include', "--namespace-include"),
+        ('namespace_exclude', "--namespace-exclude"),
+        ('snapshot_fields', "--snapshot-fields"),
+    ):
+        if params.get(key):
+            args += [option, params[key]]
+    for node in params.get('nodes', []):
+        args += ["--node", node['host'], node.get('address') or node['host'], node.get('fingerprint') or "-"]
+    try:
+        address = host_config.primary_ip_config.address
+    except ValueError:
+        # host without IP address family, e.g. "No IP"
+        address = None
+    args.append(address or host_config.name)
+    yield SpecialAgentCommand(command_arguments=args)
+
+
+special_agent_proxmox_bs = SpecialAgentConfig(
+    name="proxmox_bs",
+    parameter_parser=noop_parser,
+    commands_function=_commands_proxmox_bs,
+)
@@ -6,7 +6,7 @@
 # A file is subject to the terms and conditions defined in the file LICENSE,
 # which is part of this source code package.
 
-import pprint
+import shlex
 import sys
 from pathlib import Path
 from typing import Any, Dict
@@ -24,11 +24,22 @@ from cmk.utils import password_store
 
 def get_proxmox_bs_files(conf: Dict[str, Any]) -> FileGenerator:
     if conf is not None:
-        yield Plugin(
-            base_os=OS.LINUX,
-            source=Path("proxmox_bs"),
-            interval=3600,
-        )
+        # hourly as before by default, with interval 0 on every agent call. The
+        # plugin caches the snapshot lists itself and walks them again in the
+        # background.
+        interval = int(conf.get('interval', 3600))
+        if interval:
+            yield Plugin(
+                base_os=OS.LINUX,
+                source=Path("proxmox_bs"),
+                interval=interval,
+                asynchronous=conf.get('asynchronous'),
+            )
+        else:
+            yield Plugin(
+                base_os=OS.LINUX,
+                source=Path("proxmox_bs"),
+            )
         password = conf.get('auth_pass')
         if password[1] == "explicit_password":
             secret = password[2][1]
@@ -37,14 +48,49 @@ def get_proxmox_bs_files(conf: Dict[str, Any]) -> FileGenerator:
         else:
             secret = ""
             sys.exit(1)
+        lines = [
+            f"export PBS_USERNAME='{conf.get('auth_user')}'",
+            f"export PBS_PASSWORD='{secret}'",
+            f"export PBS_DNS_NAME='{conf.get('dns_name')}'",
+            f"export PBS_FINGERPRINT='{conf.get('fingerprint')}'",
+            f"export PBS_CACHE_SNAPSHOTS={int(conf.get('cache_snapshots', 3600))}",
+        ]
+        # the job and backup duration checks need the finished tasks
+        lines.append(f"export PBS_TASK_MODE={shlex.quote(conf.get('task_mode', 'window'))}")
+        if 'task_window' in conf:
+            lines.append(f"export PBS_TASK_WINDOW={int(conf['task_window'])}")
+        if conf.get('task_types'):
+            lines.append(f"export PBS_TASK_TYPES={shlex.quote(','.join(conf['task_types']))}")
+        if 'cache_state' in conf:
+            lines.append(f"export PBS_CACHE_STATE={int(conf['cache_state'])}")
+        if interval:
+            lines.append(f"export PBS_INTERVAL={interval}")
+        if 'parallel' in conf:
+            lines.append(f"export PBS_PARALLEL={int(conf['parallel'])}")
+        if 'timeout' in conf:
+            lines.append(f"export PBS_TIMEOUT={int(conf['timeout'])}")
+        for key, variable in (
+            ('datastore_include', 'PBS_DATASTORE_INCLUDE'),
+            ('datastore_exclude', 'PBS_DATASTORE_EXCLUDE'),
+            ('namespace_include', 'PBS_NAMESPACE_INCLUDE'),
+            ('namespace_exclude', 'PBS_NAMESPACE_EXCLUDE'),
+            ('snapshot_fields', 'PBS_SNAPSHOT_FIELDS'),
+        ):
+            if conf.get(key):
+                lines.append(f"export {variable}={shlex.quote(conf[key])}")
+        if 'client_piggyback' in conf:
+            lines.append("export PBS_CLIENT_PIGGYBACK=yes")
+            yield PluginConfig(
+                base_os=OS.LINUX,
+                lines=[
+                    f"{entry['client']} {entry['host']}"
+                    for entry in conf['client_piggyback'].get('host_map', [])
+                ],
+                target=Path("proxmox_bs.hosts"),
+            )
         yield PluginConfig(
             base_os=OS.LINUX,
-            lines=[
-                f"export PBS_USERNAME='{conf.get('auth_user')}'",
-                f"export PBS_PASSWORD='{secret}'",
-                f"export PBS_DNS_NAME='{conf.get('dns_name')}'",
-                f"export PBS_FINGERPRINT='{conf.get('fingerprint')}'",
-            ],
+            lines=lines,
             target=Path("proxmox_bs.env"),
         )
 
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 inett GmbH
+# License: GNU General Public License v2
+# A file is subject to the terms and conditions defined in the file LICENSE,
+# which is part of this source code package.
+"""Fixtures of the proxmox_bs plugin tests
+
+The check plugin needs the Checkmk Python modules, i.e. run the tests as the
+site user, the special agent does not:
+
+    OMD[mysite]:~$ python3 -m pytest tests
+"""
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmark"))
+
+PLUGIN = os.path.join(ROOT, "cmk_addons_plugins", "proxmox_bs", "agent_based", "proxmox_bs.py")
+SPECIAL_AGENT = os.path.join(ROOT, "cmk_addons_plugins", "proxmox_bs", "libexec", "agent_proxmox_bs")
+
+
+@pytest.fixture(scope="session")
+def plugin():
+    pytest.importorskip("cmk.agent_based.v2")
+    spec = importlib.util.spec_from_file_location("proxmox_bs", PLUGIN)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def special_agent():
+    loader = importlib.machinery.SourceFileLoader("agent_proxmox_bs", SPECIAL_AGENT)
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def value_store(plugin, monkeypatch):
+    """an empty value store the check functions get from get_value_store"""
+    store = {}
+    monkeypatch.setattr(plugin, "get_value_store", lambda: store)
+    return store
+
+
+@pytest.fixture
+def parse(plugin):
+    """the parsed sections of agent output, as keyword arguments of the check functions"""
+    from agent_output import string_tables
+
+    def parse(output):
+        tables = string_tables(output)
+        return {
+            "section_proxmox_bs": plugin.parse_proxmox_bs_base(tables.get("proxmox_bs", [])),
+            "section_proxmox_bs_tasks": (
+                plugin.parse_proxmox_bs_tasks(tables["proxmox_bs_tasks"]) if "proxmox_bs_tasks" in tables else None
+            ),
+            "section_proxmox_bs_gc": (
+                plugin.parse_proxmox_bs(tables["proxmox_bs_gc"]) if "proxmox_bs_gc" in tables else None
+            ),
+            "section_proxmox_bs_snapshots": (
+                plugin.parse_proxmox_bs_snapshots(tables["proxmox_bs_snapshots"])
+                if "proxmox_bs_snapshots" in tables else None
+            ),
+        }
+    return parse
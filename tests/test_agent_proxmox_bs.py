@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 inett GmbH
+# License: GNU General Public License v2
+# A file is subject to the terms and conditions defined in the file LICENSE,
+# which is part of this source code package.
+"""Tests of the special agent on the fake REST API of benchmark/fake_api.py"""
+import asyncio
+import json
+import socket
+import time
+
+import pytest
+
+from agent_output import FakePBS, string_tables
+from fake_api import start_server
+
+
+@pytest.fixture
+def pbs():
+    return FakePBS(data_stores=2, namespaces=1, clients=3, snapshots=2, tasks=20, now=int(time.time()))
+
+
+@pytest.fixture
+def api(pbs, tmp_path):
+    """a fake REST API of pbs, its requests noted in a file"""
+    calls = tmp_path / "calls"
+    server = start_server(pbs, calls=str(calls))
+    yield server.server_port, calls
+    server.shutdown()
+    server.server_close()
+
+
+def arguments(special_agent, port, *options):
+    return special_agent.parse_arguments([
+        "--user", "monitoring@pbs", "--password", "secret", "--protocol", "http", "--port", str(port),
+        *options, "127.0.0.1",
+    ])
+
+
+def subsections(lines):
+    """the JSON payload of every subsection by name and suffix, task logs left out"""
+    data, key = {}, None
+    for line in lines:
+        if line.startswith("==="):
+            key = tuple(line[3:].split("===", 1))
+        elif key is not None and key[0] != "proxmox-backup-manager task log":
+            data[key] = json.loads(line)
+            key = None
+    return data
+
+
+def test_poll(special_agent, pbs, api, tmp_path):
+    """one poll sends the sections of the agent plugin"""
+    port, _calls = api
+    args = arguments(special_agent, port, "--state-dir", str(tmp_path / "state"))
+    output, error = asyncio.run(special_agent.poll_node(args, "127.0.0.1", None))
+    assert error is None
+
+    tables = string_tables("\n".join(output))
+    assert set(tables) == {"proxmox_bs", "proxmox_bs_tasks", "proxmox_bs_gc", "proxmox_bs_snapshots",
+                           "proxmox_bs_timing"}
+    data = subsections(line for table in tables.values() for line, in table)
+    assert [e["name"] for e in data[("proxmox-backup-manager datastore list", "")]] == pbs.stores
+    for store in pbs.stores:
+        assert data[("proxmox-backup-client status", store)] == pbs.status(store)
+        assert len(data[("proxmox-backup-client snapshot list", store)]) == 2 * 3 * 2
+    window = data[("proxmox-backup-manager task window", "")]
+    assert {task["upid"] for task in window["tasks"]} == {
+        task["upid"] for task in pbs.tasks() if task["starttime"] >= window["since"] or "endtime" not in task
+    }
+    timing = data[("agent timing", "")]
+    assert timing["collector"] == "special agent"
+    assert all(command["rc"] == 0 for command in timing["commands"])
+
+
+def test_task_cursor(special_agent, pbs, api, tmp_path):
+    """the next poll asks for the tasks since the oldest one still running"""
+    port, _calls = api
+    args = arguments(special_agent, port, "--state-dir", str(tmp_path / "state"), "--task-window", "86400")
+    since = []
+    for _poll in range(2):
+        output, error = asyncio.run(special_agent.poll_node(args, "127.0.0.1", None, name="pbs01"))
+        assert error is None
+        since.append(subsections(output)[("proxmox-backup-manager task window", "")]["since"])
+    running = min(task["starttime"] for task in pbs.tasks(running_only=True))
+    assert (tmp_path / "state" / "tasks.since.pbs01").read_text() == f"{running}\n"
+    assert since[0] <= pbs.now - 86400 + 5
+    assert since[1] == running
+
+
+def test_failed_login(special_agent, api):
+    """without the ticket of a login the API answers 401, a node fails with its reason"""
+    port, _calls = api
+    args = arguments(special_agent, port)
+
+    async def unauthorized():
+        client = special_agent.PbsApi(args, "127.0.0.1", None)
+        try:
+            return await client.call("GET", "/config/datastore"), client.commands
+        finally:
+            client.close()
+
+    data, commands = asyncio.run(unauthorized())
+    assert data is None
+    assert commands[0]["rc"] == 401
+
+    # a port nothing listens on
+    with socket.socket() as closed:
+        closed.bind(("127.0.0.1", 0))
+        args = arguments(special_agent, closed.getsockname()[1])
+    output, error = asyncio.run(special_agent.poll_node(args, "127.0.0.1", None))
+    assert error is not None and "login at 127.0.0.1 failed" in error
+    assert output[0] == "<<<proxmox_bs_timing:sep(0)>>>"
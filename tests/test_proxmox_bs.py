@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 inett GmbH
+# License: GNU General Public License v2
+# A file is subject to the terms and conditions defined in the file LICENSE,
+# which is part of this source code package.
+"""Tests of the proxmox_bs check plugins on the output of benchmark/agent_output.py"""
+import json
+
+from agent_output import DAY, FakePBS, agent_output, legacy_agent_output
+
+CLIENT_PARAMS = {'bkp_age': ('fixed', (172800, 259200)), 'snapshot_min_ok': 1, 'backup_duration': ('no_levels', None)}
+JOB_PARAMS = {
+    'age': ('no_levels', None), 'duration': ('no_levels', None), 'running_time': ('fixed', (43200.0, 86400.0)),
+    'running_jobs': ('fixed', (2, 3)), 'other_tasks': ('no_levels', None),
+}
+
+
+def summaries(results):
+    return [result.summary for result in results if hasattr(result, "summary")]
+
+
+def metrics(results):
+    return {result.name: result.value for result in results if not hasattr(result, "summary")}
+
+
+def test_legacy_agent(plugin, parse, value_store):
+    """agents from before the split send everything in the proxmox_bs section"""
+    sections = parse(legacy_agent_output(data_stores=2, namespaces=1, clients=3, snapshots=3))
+    assert sections["section_proxmox_bs_snapshots"] is None
+    stores = [service.item for service in plugin.discover_proxmox_bs(**sections)]
+    assert stores == ["store00", "store01"]
+
+    results = list(plugin.check_proxmox_bs("store00", plugin.FILESYSTEM_DEFAULT_LEVELS, **sections))
+    assert "GC ok" in summaries(results)
+    assert "Snapshot lists not collected yet" not in summaries(results)
+    assert metrics(results)["total_backups"] == 2 * 3 * 3
+    assert metrics(results)["group_count"] == 2 * 3
+    # the GC of the last datastore is the running task of the task list
+    results = list(plugin.check_proxmox_bs("store01", plugin.FILESYSTEM_DEFAULT_LEVELS, **sections))
+    assert "GC running" in summaries(results)
+
+    clients = [
+        service.item for service in plugin.proxmox_bs_clients_discovery(None, None, sections["section_proxmox_bs"], None)
+    ]
+    assert len(clients) == 2 * 2 * 3
+    assert "100-guest000 store00 ns0" in clients
+    results = list(plugin.proxmox_bs_clients_checks(
+        "100-guest000 store00 ns0", CLIENT_PARAMS, None, None, sections["section_proxmox_bs"], None,
+    ))
+    assert "Snapshots verify OK: 3" in summaries(results)
+
+
+def test_legacy_group_list(plugin, parse, value_store):
+    """the group list of older agents counts the groups and snapshots of a datastore"""
+    output = legacy_agent_output(data_stores=1, namespaces=0, clients=3, snapshots=3)
+    sections = parse(output.replace('"backup-count":3', '"backup-count":5'))
+    assert "proxmox-backup-client_list" in sections["section_proxmox_bs"]["data_stores"]["store00"]
+    results = list(plugin.check_proxmox_bs("store00", plugin.FILESYSTEM_DEFAULT_LEVELS, **sections))
+    assert metrics(results)["group_count"] == 3
+    assert metrics(results)["total_backups"] == 3 * 5
+
+
+def _snapshot(backup_id, comment, backup_time, verified=False):
+    snapshot = {"backup-type": "vm", "backup-id": backup_id, "backup-time": backup_time, "comment": comment}
+    if verified:
+        snapshot["verification"] = {"state": "ok", "upid": "UPID:pbs:0:0:0:0:verificationjob:store00:root@pam:"}
+    return snapshot
+
+
+def _delta(serial, base, added=None, changed=None, removed=(), groups_added=(), groups_removed=()):
+    return {
+        "serial": serial, "base": base, "full": serial == base, "added": added or {}, "changed": changed or {},
+        "removed": list(removed), "groups_added": list(groups_added), "groups_removed": list(groups_removed),
+    }
+
+
+def _section(name, values):
+    return [line for suffix, value in values.items() for line in ([f"==={name}==={suffix}"], [json.dumps(value)])]
+
+
+def test_delta_rebuilt_from_base(plugin):
+    """changes since the base apply to the base, whatever runs the check missed"""
+    a1, a2, b1 = _snapshot("100", "a", 1), _snapshot("100", "a", 2), _snapshot("101", "b", 1)
+    value_store = {}
+    full = {"proxmox-backup-client_snapshot_delta": _delta(1, 1, added={"vm/100/1": a1, "vm/101/1": b1})}
+    snapshots, complete = plugin.proxmox_bs_snapshots(value_store, "snapshots", full)
+    assert complete and len(snapshots) == 2
+    # runs 2 and 3 not seen
+    delta = {"proxmox-backup-client_snapshot_delta": _delta(
+        4, 1, added={"vm/100/2": a2}, changed={"vm/100/1": {**a1, "verification": {"state": "ok"}}},
+        removed=["vm/101/1"],
+    )}
+    snapshots, complete = plugin.proxmox_bs_snapshots(value_store, "snapshots", delta)
+    assert complete
+    assert sorted((e["backup-time"], "verification" in e) for e in snapshots) == [(1, True), (2, False)]
+    # the base is kept as it was
+    assert sorted(value_store["snapshots"]["snapshots"]) == ["vm/100/1", "vm/101/1"]
+
+    # a value store created since lacks the base
+    snapshots, complete = plugin.proxmox_bs_snapshots({}, "snapshots", delta)
+    assert not complete
+
+
+def test_delta_clients_from_groups(plugin, value_store):
+    """deltas only name the changes of the groups of their base, sent once"""
+    base_groups = {"store00": {"base": 1, "groups": [["100", "a", "", "vm"], ["101", "b", "", "vm"]]}}
+    delta = _delta(
+        3, 1, added={"vm/102/5": _snapshot("102", "c", 5, verified=True)},
+        groups_added=[["102", "c", "", "vm"]], groups_removed=[["101", "b", "", "vm"]],
+    )
+    snapshots = plugin.parse_proxmox_bs_snapshots(_section("proxmox-backup-client snapshot delta", {"store00": delta}))
+    client_groups = plugin.parse_proxmox_bs(_section("proxmox-backup-client groups", base_groups))
+
+    assert list(plugin.proxmox_bs_clients_discovery(snapshots, None, None, None)) == []
+    clients = [service.item for service in plugin.proxmox_bs_clients_discovery(snapshots, None, None, client_groups)]
+    assert sorted(clients) == ["100-a", "102-c"]
+
+    # all snapshots of a client new since the base are in the delta
+    results = summaries(plugin.proxmox_bs_clients_checks("102-c", CLIENT_PARAMS, snapshots, None, None, client_groups))
+    assert "Snapshots verify OK: 1" in results
+    assert not any("incomplete" in summary for summary in results)
+    # those of a client of the base are not, its service has a value store of its own
+    value_store.clear()
+    results = summaries(plugin.proxmox_bs_clients_checks("100-a", CLIENT_PARAMS, snapshots, None, None, client_groups))
+    assert "Snapshot list of store00 incomplete until the next full list from the agent" in results
+
+
+def test_errors_of_no_data_store(plugin, parse, value_store):
+    """malformed output of no datastore is reported once, by the agent collection service"""
+    output = agent_output(data_stores=2, namespaces=0, clients=2, snapshots=2, tasks=5)
+    lines = output.splitlines()
+    window = lines.index("===proxmox-backup-manager task window===") + 1
+    lines[window] = lines[window][:-10]
+    timing = {"collector": "cli", "duration": 1.0, "interval": 0, "units": [], "commands": []}
+    sections = parse("\n".join(lines))
+
+    results = summaries(plugin.check_proxmox_bs("store00", plugin.FILESYSTEM_DEFAULT_LEVELS, **sections))
+    assert not any(summary.startswith("Malformed") for summary in results)
+    results = list(plugin.check_proxmox_bs_collection(
+        {'interval_usage': ('no_levels', None), 'data_store_duration': ('no_levels', None), 'check_interval': 60.0},
+        plugin.parse_proxmox_bs([["===agent timing==="], [json.dumps(timing)]]), **sections,
+    ))
+    assert "Malformed agent output in proxmox-backup-manager task window" in summaries(results)
+
+
+def test_snapshot_columns(plugin):
+    """the columns of a snapshot list count what the decoded snapshots do"""
+    pbs = FakePBS(data_stores=1, namespaces=1, clients=4, snapshots=5)
+    snapshot_list = [{**e, "ns": ns} if ns else e for ns in ("", "ns1") for e in pbs.snapshots("store00", ns)]
+    snapshots = plugin.ProxmoxBsSnapshots(snapshot_list)
+
+    assert len(snapshots) == 2 * 4 * 5
+    assert snapshots.groups == 2 * 4
+    states = [(e.get("verification") or {}).get("state") for e in snapshot_list]
+    assert snapshots.count(plugin.PROXMOX_BS_VERIFY_OK) == states.count("ok")
+    assert snapshots.count(plugin.PROXMOX_BS_VERIFY_FAILED) == states.count("failed")
+    assert snapshots.count(plugin.PROXMOX_BS_VERIFY_NONE) == states.count(None)
+    assert len(snapshots.problems) == states.count("failed")
+    assert (("100", "guest000 store00 ns0"), ("", "vm", "100")) in snapshots.client_groups()
+    assert (("1103", "guest003 store00 ns1"), ("ns1", "ct", "1103")) in snapshots.client_groups()
+
+    times = sorted(e["backup-time"] for e in snapshot_list if e["backup-id"] == "100")
+    assert snapshots.newest(("", "vm", "100"), 0, pbs.now) == (times[-1], 34359741364)
+    assert snapshots.newest(("", "vm", "100"), 0, times[-1] - 1) == (times[-2], 34359741364)
+    assert snapshots.newest(("ns1", "vm", "100"), 0, pbs.now) is None
+
+
+def test_task_index(plugin):
+    """the tasks are indexed by datastore and worker type, the backups by group"""
+    pbs = FakePBS(data_stores=2, namespaces=0, clients=3, tasks=40)
+    tasks = plugin.parse_proxmox_bs_tasks(_section("proxmox-backup-manager task window", {
+        "": {"since": pbs.now - 7 * DAY, "tasks": pbs.tasks()},
+    }) + _section("proxmox-backup-manager verify-job list", {"": pbs.jobs("verify")}))
+
+    for store in pbs.stores:
+        for worker_type in ("verificationjob", "prunejob", "syncjob"):
+            finished = [
+                task for task in pbs.tasks() if task["worker_type"] == worker_type
+                and plugin._task_data_store(task) == store
+            ]
+            last = plugin.proxmox_bs_tasks(tasks["task_index"].get(store, {}), worker_type)["last"]
+            assert last == (max(finished, key=lambda task: task["endtime"]) if finished else None)
+    running = plugin.proxmox_bs_tasks(tasks["task_index"]["store01"], "garbage_collection")["running"]
+    assert [task["worker_id"] for task in running] == ["store01"]
+
+    backups = [task for task in pbs.tasks() if task["worker_type"] == "backup"]
+    assert set(tasks["backups"]) == {
+        (store, "", "vm", backup_id)
+        for store, _, backup_id in (task["worker_id"].replace(":", "/").split("/") for task in backups)
+    }
+    assert plugin._task_backup_group({"worker_id": "fs01:ns1/sub:vm/103"}) == ("fs01", "ns1/sub", "vm", "103")
+    assert tasks["jobs"] == {"verificationjob": {store: [f"v-{store}"] for store in pbs.stores}}
+
+    jobs = [service.item for service in plugin.discover_proxmox_bs_jobs(tasks)]
+    assert "Verify store00" in jobs and "Verify store01" in jobs
+
+
+def test_task_window_merge(plugin):
+    """a task window only brings the newer tasks, the last finished ones are kept"""
+    old = {"worker_type": "prunejob", "worker_id": "store00", "starttime": 100, "endtime": 200, "status": "OK"}
+    new = {**old, "starttime": 300, "endtime": 400, "status": "WARNINGS: 1"}
+    value_store = {}
+
+    def window(*tasks):
+        return plugin.parse_proxmox_bs_tasks(_section("proxmox-backup-manager task window", {
+            "": {"since": 0, "tasks": list(tasks)},
+        }))
+
+    tasks = plugin.proxmox_bs_data_store_tasks(value_store, window(old), "store00")
+    assert tasks["prunejob"]["last"] == old
+    tasks = plugin.proxmox_bs_data_store_tasks(value_store, window(), "store00")
+    assert tasks["prunejob"] == {"running": [], "last": old}
+    tasks = plugin.proxmox_bs_data_store_tasks(value_store, window(new), "store00")
+    assert tasks["prunejob"]["last"] == new
+    # an older task sent again does not replace a newer one
+    tasks = plugin.proxmox_bs_data_store_tasks(value_store, window(old), "store00")
+    assert tasks["prunejob"]["last"] == new
+
+    # a task list holds the last tasks itself
+    task_list = plugin.parse_proxmox_bs_tasks(_section("proxmox-backup-manager task list", {"": []}))
+    assert plugin.proxmox_bs_data_store_tasks(value_store, task_list, "store00") == {}
+
+
+def test_job_from_value_store(plugin, value_store):
+    """a job check shows the last run from an earlier window"""
+    task = {"worker_type": "prunejob", "worker_id": "store00", "starttime": 100, "endtime": 160, "status": "OK"}
+    for tasks in ([task], []):
+        section = plugin.parse_proxmox_bs_tasks(_section("proxmox-backup-manager task window", {
+            "": {"since": 0, "tasks": tasks},
+        }))
+        results = list(plugin.check_proxmox_bs_jobs("Prune store00", JOB_PARAMS, section))
+        assert any(summary.startswith("Last run ") for summary in summaries(results))
+        assert metrics(results)["pbs_job_duration"] == 60
+
+
+def test_delta_previous_chain(plugin):
+    """older agents send the changes since their previous run"""
+    a1, a2 = _snapshot("100", "a", 1), _snapshot("100", "a", 2)
+
+    def delta(serial, previous, added=None, removed=(), full=False):
+        return {"proxmox-backup-client_snapshot_delta": {
+            "serial": serial, "previous": previous, "full": full,
+            "added": added or {}, "changed": {}, "removed": list(removed),
+        }}
+
+    value_store = {}
+    assert plugin.proxmox_bs_snapshots(value_store, "s", delta(1, 0, {"vm/100/1": a1}, full=True)) == ([a1], True)
+    # the same output checked again
+    assert plugin.proxmox_bs_snapshots(value_store, "s", delta(1, 0, {"vm/100/1": a1}, full=True)) == ([a1], True)
+    assert plugin.proxmox_bs_snapshots(value_store, "s", delta(2, 1, {"vm/100/2": a2})) == ([a1, a2], True)
+    # run 3 missed
+    snapshots, complete = plugin.proxmox_bs_snapshots(value_store, "s", delta(4, 3, removed=["vm/100/1"]))
+    assert (snapshots, complete) == ([a2], False)
+    assert plugin.proxmox_bs_snapshots(value_store, "s", delta(5, 4, {"vm/100/1": a1}, full=True)) == ([a1], True)
+
+
+def test_delta_agent_runs(plugin, parse, value_store):
+    """a datastore check rebuilds the whole snapshot list from deltas"""
+    full = agent_output(data_stores=1, namespaces=0, clients=3, snapshots=3, tasks=5)
+    sections = parse(full)
+    expected = metrics(plugin.check_proxmox_bs("store00", plugin.FILESYSTEM_DEFAULT_LEVELS, **sections))
+
+    snapshot_list = sections["section_proxmox_bs_snapshots"]["data_stores"]["store00"]
+    pbs = FakePBS(data_stores=1, namespaces=0, clients=3, snapshots=3)
+    snapshots = {f"{e['backup-type']}/{e['backup-id']}/{e['backup-time']}": e for e in pbs.snapshots("store00", "")}
+    assert len(snapshots) == len(snapshot_list["proxmox-backup-client_snapshot_list"])
+    for delta in (_delta(1, 1, added=snapshots), _delta(2, 1), _delta(3, 1)):
+        sections["section_proxmox_bs_snapshots"] = plugin.parse_proxmox_bs_snapshots(
+            _section("proxmox-backup-client snapshot delta", {"store00": delta})
+        )
+        results = list(plugin.check_proxmox_bs("store00", plugin.FILESYSTEM_DEFAULT_LEVELS, **sections))
+        assert metrics(results)["total_backups"] == expected["total_backups"]
+        assert metrics(results)["group_count"] == expected["group_count"]